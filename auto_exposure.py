@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Image statistics on a subsampled pixel grid and closed-loop auto-exposure/gain controller.
+"""
+import numpy as np
+
+MIN_SAMPLES = 4096
+
+
+def sparse_percentiles(img, percentiles, step=8):
+    """
+    Computes the percentiles of img on a grid taking one pixel every step in x and y.
+    The step is reduced for small images, to keep at least MIN_SAMPLES pixels.
+    """
+    step = max(1, min(int(step), int(np.sqrt(img.size / MIN_SAMPLES))))
+    sample = img[::step, ::step].ravel()
+    return np.percentile(sample, percentiles)
+
+
+class AutoExposureController:
+
+    def __init__(self, target=0.5, percentile=99., damping=0.5, step=8, tolerance=0.05):
+        """
+        Args:
+            target (float): desired level of the percentile, as fraction of the full scale
+            percentile (float): percentile of the pixel values that is regulated
+            damping (float): fraction (0,1] of the correction applied at each update
+            step (int): subsampling step of the pixel grid
+            tolerance (float): relative error below which no correction is applied
+        """
+        self.target = target
+        self.percentile = percentile
+        self.damping = damping
+        self.step = step
+        self.tolerance = tolerance
+        self.level = 0.
+
+    def update(self, img, exposure_ms, gain, full_scale, max_exposure_ms, max_gain, min_gain=1.):
+        """
+        Returns the new (exposure_ms, gain), or None if no correction is needed.
+        Exposure is adjusted first, gain is raised only when exposure reaches max_exposure_ms.
+        """
+        value = sparse_percentiles(img, self.percentile, self.step)
+        self.level = max(float(value), 1.) / full_scale
+        error = self.target / self.level
+        if abs(error - 1) < self.tolerance:
+            return None
+        total = exposure_ms * gain * error ** self.damping
+        new_gain = float(np.clip(total / max_exposure_ms, min_gain, max_gain))
+        new_exposure = min(total / new_gain, max_exposure_ms)
+        return new_exposure, new_gain
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""
+Measures the import time of ids_record and the time from interpreter start
+to the first frame of a headless recording on the emulated IDS peak backend.
+
+    python benchmarks/bench_cli_startup.py
+"""
+import os, sys, subprocess, tempfile, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run(args):
+    return subprocess.run([sys.executable, *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+
+
+if __name__ == '__main__':
+    out = run(['-c', 'import time; t=time.perf_counter(); import ids_record; print(time.perf_counter()-t)'])
+    print(f"import ids_record: {float(out)*1000:.1f} ms")
+
+    out = run(['-c', 'import ids_record, sys; print(any(m in sys.modules for m in ("h5py", "pyqtgraph", "qtpy", "PyQt5", "ScopeFoundry")))'])
+    print(f"heavy modules imported at startup: {out.strip()}")
+
+    with tempfile.TemporaryDirectory() as save_dir:
+        t = time.perf_counter()
+        out = run(['ids_record.py', 'settings/high_frame_rate.ini', '--mock',
+                   '--frames', '100', '--save-dir', save_dir])
+        print(out.strip())
+        print(f"total process time: {time.perf_counter() - t:.3f} s")
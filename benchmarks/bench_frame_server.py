@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Throughput of the shared-memory FrameServer with several subscriber processes.
+One of the subscribers is slow, to show that it does not slow down the publisher.
+
+    python benchmarks/bench_frame_server.py
+"""
+import os, sys, time, tempfile
+import multiprocessing as mp
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from frame_server import FrameServer, FrameClient
+
+SHAPE = (512, 512)
+DURATION = 3.0
+
+
+def subscriber(address, delay, results):
+    client = FrameClient(address)
+    received = valid = 0
+    checksum = 0
+    try:
+        while True:
+            if delay:
+                frame, meta = client.get_latest_frame(timeout=1.0) # slow readers skip to the newest frame
+            else:
+                frame, meta = client.get_frame(timeout=1.0)
+            checksum += int(frame[0, 0]) # touch the frame in place
+            if delay:
+                time.sleep(delay)
+            received += 1
+            valid += client.is_valid(meta)
+    except (ConnectionError, OSError):
+        pass
+    results.put((os.getpid(), delay, received, valid))
+
+
+if __name__ == '__main__':
+    address = os.path.join(tempfile.gettempdir(), 'ids_frames_bench.sock')
+    server = FrameServer(address, slots=32)
+    results = mp.Queue()
+    delays = [0, 0, 0, 0.01]
+    procs = [mp.Process(target=subscriber, args=(address, d, results)) for d in delays]
+    for p in procs:
+        p.start()
+    while server.subscriber_count < len(procs):
+        time.sleep(0.01)
+
+    frames = [np.full(SHAPE, i, dtype=np.uint16) for i in range(8)]
+    published = 0
+    t = time.perf_counter()
+    while time.perf_counter() - t < DURATION:
+        server.publish(frames[published % 8])
+        published += 1
+    elapsed = time.perf_counter() - t
+    server.close()
+
+    print(f"published {published/elapsed:.0f} frames/s of {SHAPE} uint16 "
+          f"({published*frames[0].nbytes/elapsed/1e9:.2f} GB/s) to {len(procs)} subscribers")
+    for _ in procs:
+        pid, delay, received, valid = results.get()
+        print(f"subscriber {pid} (delay {delay*1000:.0f} ms): received {received/elapsed:.0f} frames/s, "
+              f"{valid} of {received} still valid after use")
+    for p in procs:
+        p.join()
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Per-frame overhead of the frame-by-frame loop (get_frame and one HDF5 write per frame)
+versus the batched path (get_frames and one HDF5 write per block), on the emulated
+IDS peak backend with the 256x16 Mono8 ROI of settings/high_frame_rate.ini.
+Frames are accumulated in the buffers before reading them, so that the time measured
+is the host overhead and not the frame period.
+
+    python benchmarks/bench_get_frames.py
+"""
+import os, sys, time, tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import h5py
+import mock_ids_peak
+mock_ids_peak.INIT_DELAY = mock_ids_peak.UPDATE_DELAY = 0
+mock_ids_peak.install()
+from ids_library import Camera
+
+FRAMES = 4000
+BATCH = 64
+
+
+def prepare(cam):
+    cam.set_frame_num(FRAMES)
+    cam.set_stream_mode("OldestFirst")
+    cam.start_acquisition(buffersize=FRAMES)
+    time.sleep(FRAMES / cam.get_frame_rate() + 0.1) # all the frames are waiting in the buffers
+
+
+def loop(cam, dset):
+    prepare(cam)
+    t = time.perf_counter()
+    for i in range(FRAMES):
+        dset[i] = cam.get_frame()
+    elapsed = time.perf_counter() - t
+    cam.stop_acquisition()
+    return elapsed
+
+
+def batched(cam, dset):
+    prepare(cam)
+    t = time.perf_counter()
+    i = 0
+    while i < FRAMES:
+        block, _, _ = cam.get_frames(min(BATCH, FRAMES - i))
+        dset[i:i+len(block)] = block
+        i += len(block)
+    elapsed = time.perf_counter() - t
+    cam.stop_acquisition()
+    return elapsed
+
+
+if __name__ == '__main__':
+    cam = Camera()
+    cam.set_bit_depth(8)
+    cam.set_active_region(16, 16, 256, 16)
+    cam.set_exposure_ms(0.1)
+    cam.set_frame_rate(4000)
+    with tempfile.TemporaryDirectory() as tmp, h5py.File(os.path.join(tmp, 'bench.h5'), 'w') as h5file:
+        dset = h5file.create_dataset('t0/c0/image', shape=[FRAMES, 16, 256], dtype='uint8')
+        for name, func in (('get_frame loop', loop), (f'get_frames({BATCH})', batched)):
+            elapsed = func(cam, dset)
+            print(f"{name}: {elapsed/FRAMES*1e6:.1f} us per frame ({FRAMES/elapsed:.0f} fps max)")
+    cam.close()
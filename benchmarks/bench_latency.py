@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Latency between the end of the exposure and the frame available in Python, in the
+low-latency mode of Camera (NewestOnly, minimal buffer pool), for several ROI sizes.
+Device timestamps are referred to the host clock with the TimestampLatch node.
+Runs on the emulated IDS peak backend, or on the first connected camera with --hardware.
+
+    python benchmarks/bench_latency.py [--hardware] [--cpu N] [--frames N]
+"""
+import os, sys, argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ROIS = [(256, 16), (512, 512), (1024, 1024), (1936, 1096)]
+EXPOSURE_MS = 1.0
+
+
+def measure(cam, width, height, frames, nocopy=False):
+    sensor_width, sensor_height = cam.get_size()
+    width, height = min(width, sensor_width), min(height, sensor_height)
+    cam.set_active_region((sensor_width - width)//2, (sensor_height - height)//2, width, height)
+    cam.set_exposure_ms(EXPOSURE_MS)
+    cam.set_frame_rate(100)
+    cam.set_acquisition_mode("Continuous")
+    cam.start_acquisition(live=True)
+    get = cam.get_frame_nocopy if nocopy else cam.get_frame
+    for _ in range(10): # warm up
+        get()
+    cam.reset_latency()
+    for _ in range(frames):
+        get()
+    cam.stop_acquisition()
+    return cam.get_width(), cam.get_height(), cam.get_latency_stats()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--hardware', action='store_true', help='use the connected camera')
+    parser.add_argument('--cpu', type=int, default=-1, help='pin the grabbing thread to this core')
+    parser.add_argument('--frames', type=int, default=300)
+    args = parser.parse_args()
+    if not args.hardware:
+        import mock_ids_peak
+        mock_ids_peak.INIT_DELAY = mock_ids_peak.UPDATE_DELAY = 0
+        mock_ids_peak.install()
+    from ids_library import Camera, pin_current_thread
+    if args.cpu >= 0:
+        pin_current_thread(args.cpu)
+
+    cam = Camera()
+    cam.set_bit_depth(8)
+    cam.set_low_latency(True)
+    print(f"{cam.get_model()}, exposure {EXPOSURE_MS} ms, {args.frames} frames, cpu {args.cpu}")
+    print(f"{'ROI':>11} {'read':>7} {'mean':>7} {'p50':>7} {'p99':>7} {'max':>7}  (ms)")
+    for width, height in ROIS:
+        for nocopy in (False, True):
+            w, h, stats = measure(cam, width, height, args.frames, nocopy)
+            print(f"{w:>5}x{h:<5} {'nocopy' if nocopy else 'copy':>7} {stats['mean']:7.3f} "
+                  f"{stats['p50']:7.3f} {stats['p99']:7.3f} {stats['max']:7.3f}")
+    cam.close()
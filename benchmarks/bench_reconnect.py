@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+Measures the time of Camera close/open cycles on the emulated IDS peak backend,
+with the device kept in the IdsSession pool (keep_open=True) and without it,
+which re-initializes the library and rescans the devices at every connection.
+
+    python benchmarks/bench_reconnect.py
+"""
+import os, sys, time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mock_ids_peak
+mock_ids_peak.install()
+from ids_library import Camera, IdsSession
+
+
+def reconnect_times(cycles, keep_open, serial=None):
+    times = []
+    for _ in range(cycles):
+        t = time.perf_counter()
+        cam = Camera(serial=serial, keep_open=keep_open)
+        cam.get_model()
+        times.append(time.perf_counter() - t)
+        cam.close()
+    return times
+
+
+if __name__ == '__main__':
+    cycles = 5
+    for keep_open in (False, True):
+        IdsSession.shutdown()
+        times = reconnect_times(cycles, keep_open)
+        print(f"keep_open={keep_open}: first connection {times[0]*1000:.1f} ms, "
+              f"reconnection {sum(times[1:])/(cycles-1)*1000:.3f} ms")
+
+    serial = Camera().get_serial()
+    times = reconnect_times(cycles, True, serial)
+    print(f"by serial {serial}: reconnection {sum(times)/cycles*1000:.3f} ms")
+    IdsSession.shutdown()
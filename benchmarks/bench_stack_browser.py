@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Scrubbing latency of StackBrowser on stacks of increasing length,
+scrubbing forward frame by frame as with the playback_frame slider.
+
+    python benchmarks/bench_stack_browser.py
+"""
+import os, sys, time, tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import h5py
+from stack_browser import StackBrowser, ThumbnailWriter
+
+SHAPE = (1096, 1936)
+
+
+def write_stack(fname, frames):
+    frame = np.random.default_rng(0).integers(0, 4096, SHAPE).astype(np.uint16)
+    with h5py.File(fname, 'w') as h5file:
+        group = h5file.create_group('measurement/IDSmeasurement')
+        dset = group.create_dataset('t0/c0/image', shape=[frames, *SHAPE], dtype=np.uint16)
+        thumbnails = ThumbnailWriter(group, frames, SHAPE, np.uint16)
+        for i in range(frames):
+            dset[i] = frame
+            thumbnails.write(i, frame)
+
+
+def scrub(browser, frames, level=0, interval=0.02):
+    latencies = []
+    for i in range(frames):
+        t = time.perf_counter()
+        browser.get_thumbnail(i, level)
+        latencies.append(time.perf_counter() - t)
+        time.sleep(interval) # user scrubbing at 50 frames/s
+    return np.median(latencies) * 1000, np.percentile(latencies, 95) * 1000
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmp:
+        for frames in (100, 1000):
+            fname = os.path.join(tmp, f'stack_{frames}.h5')
+            write_stack(fname, frames)
+            browser = StackBrowser(fname)
+            size = os.path.getsize(fname) / 1e9
+            for level in [0] + browser.levels:
+                median, p95 = scrub(browser, 100, level)
+                print(f"{frames} frames ({size:.1f} GB), level {level}: "
+                      f"median {median:.3f} ms, 95th percentile {p95:.3f} ms")
+            browser.close()
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Timing of the TimeLapse scheduler on the emulated IDS peak backend, writing each time point 
+to its t<n>/c0/image dataset of a single HDF5 file, for decreasing intervals and both burst modes.
+Compared with the previous approach of one full acquisition (start_acquisition/stop_acquisition) per time point.
+
+    python benchmarks/bench_timelapse.py
+"""
+import os, sys, time, tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import h5py
+import mock_ids_peak
+mock_ids_peak.INIT_DELAY = mock_ids_peak.UPDATE_DELAY = 0
+mock_ids_peak.install()
+from ids_library import Camera
+from timelapse import TimeLapse, ModeChoices
+
+POINTS = 50
+FRAMES = 4
+SHAPE = (256, 512)
+
+
+def create_datasets(h5file, points):
+    return [h5file.create_dataset(f't{n}/c0/image', shape=[FRAMES, *SHAPE], dtype='uint8')
+            for n in range(points)]
+
+
+def run_timelapse(cam, h5file, interval, mode):
+    datasets = create_datasets(h5file, POINTS)
+    def write(n, block):
+        datasets[n][...] = block
+    timelapse = TimeLapse(cam, POINTS, interval, FRAMES, mode)
+    timelapse.run(write)
+    return timelapse.get_stats()
+
+
+def run_restarting(cam, h5file, interval):
+    """ One acquisition per time point, as when measure() is repeated"""
+    datasets = create_datasets(h5file, POINTS)
+    t0 = time.perf_counter()
+    starts, busy, waits = [], [], []
+    for n in range(POINTS):
+        delay = t0 + n * interval - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        t = time.perf_counter()
+        cam.set_frame_num(FRAMES)
+        cam.start_acquisition(buffersize=FRAMES)
+        wait = 0
+        for i in range(FRAMES):
+            t_wait = time.perf_counter()
+            img = cam.get_frame()
+            wait += time.perf_counter() - t_wait
+            datasets[n][i] = img
+        cam.stop_acquisition()
+        starts.append(t)
+        busy.append(time.perf_counter() - t)
+        waits.append(wait)
+    return {'jitter_ms': np.diff(starts).std() * 1000,
+            'overhead_ms': (np.mean(busy) - np.mean(waits)) * 1000,
+            'busy_max_ms': max(busy) * 1000,
+            'late': int(np.sum(np.array(starts) - t0 - np.arange(POINTS) * interval > 0.001))}
+
+
+if __name__ == '__main__':
+    cam = Camera()
+    cam.set_bit_depth(8)
+    cam.set_active_region(0, 0, SHAPE[1], SHAPE[0])
+    cam.set_exposure_ms(1)
+    cam.set_frame_rate(250)
+    print(f"{POINTS} time points of {FRAMES} frames {SHAPE} at {cam.get_frame_rate():.0f} fps "
+          f"(burst {FRAMES/cam.get_frame_rate()*1000:.0f} ms)")
+    print(f"{'':>12} {'interval':>9} {'jitter':>8} {'overhead':>9} {'busy max':>9} {'late':>5}  (ms)")
+    with tempfile.TemporaryDirectory() as tmp:
+        for interval in (0.2, 0.05, 0.03):
+            for mode in ModeChoices:
+                with h5py.File(os.path.join(tmp, f'{mode}_{interval}.h5'), 'w') as h5file:
+                    s = run_timelapse(cam, h5file, interval, mode)
+                print(f"{mode:>12} {interval*1000:9.0f} {s['jitter_ms']:8.3f} {s['overhead_ms']:9.2f} "
+                      f"{s['busy_max_ms']:9.2f} {s['late']:5d}")
+            with h5py.File(os.path.join(tmp, f'restart_{interval}.h5'), 'w') as h5file:
+                s = run_restarting(cam, h5file, interval)
+            print(f"{'restarting':>12} {interval*1000:9.0f} {s['jitter_ms']:8.3f} {s['overhead_ms']:9.2f} "
+                  f"{s['busy_max_ms']:9.2f} {s['late']:5d}")
+    cam.close()
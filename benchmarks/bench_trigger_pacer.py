@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Cost of the software trigger pacer (Camera.start_trigger_task) for the other Python threads,
+on the emulated IDS peak backend with the 256x16 Mono8 ROI of settings/high_frame_rate.ini:
+iterations/s of a loop that releases the GIL once per iteration, without and with the pacer,
+and frames/s grabbed with get_frame while the pacer triggers each frame.
+
+    python benchmarks/bench_trigger_pacer.py
+"""
+import os, sys, time, threading
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mock_ids_peak
+mock_ids_peak.INIT_DELAY = mock_ids_peak.UPDATE_DELAY = 0
+mock_ids_peak.install()
+from ids_library import Camera
+
+DURATION_S = 2.0
+RATES = [100, 1000, 2000]
+
+
+def releasing_loop(duration):
+    """ Stands for a grab loop blocked in WaitForFinishedBuffer: releases the GIL at each iteration"""
+    event = threading.Event()
+    n = 0
+    t_end = time.perf_counter() + duration
+    while time.perf_counter() < t_end:
+        event.wait(0.00005)
+        n += 1
+    return n / duration
+
+
+def grab(cam, rate, duration):
+    cam.set_acquisition_mode("Continuous")
+    cam.enable_software_trigger()
+    cam.start_acquisition()
+    cam.start_trigger_task(rate)
+    frames = 0
+    t_end = time.perf_counter() + duration
+    while time.perf_counter() < t_end:
+        cam.get_frame()
+        frames += 1
+    cam._stop_trigger_task()
+    cam.stop_acquisition()
+    cam.disable_trigger()
+    return frames / duration
+
+
+if __name__ == '__main__':
+    cam = Camera()
+    cam.set_bit_depth(8)
+    cam.set_active_region(16, 16, 256, 16)
+    cam.set_exposure_ms(0.1)
+    cam.set_frame_rate(4000)
+    print(f"no pacer: {releasing_loop(DURATION_S):.0f} iterations/s")
+    for rate in RATES:
+        cam.start_trigger_task(rate)
+        iterations = releasing_loop(DURATION_S)
+        cam._stop_trigger_task()
+        fps = grab(cam, rate, DURATION_S)
+        print(f"pacer at {rate} Hz: {iterations:.0f} iterations/s, grabbed {fps:.0f} frames/s "
+              f"(jitter {cam.get_trigger_stats()['jitter_ms']:.3f} ms)")
+    cam.close()
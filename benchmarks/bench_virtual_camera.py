@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Replays a recorded stack through VirtualCamera at maximum speed,
+alone and saving it again with ZarrWriter, to measure the pipeline throughput without hardware.
+A synthetic stack with the IdsMeasure layout is written if no file is given.
+
+    python benchmarks/bench_virtual_camera.py [stack.h5]
+"""
+import os, sys, time, tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import h5py
+from virtual_camera import VirtualCamera
+from zarr_writer import ZarrWriter
+
+
+def write_test_stack(fname, frames=500, shape=(1096, 1936)):
+    rng = np.random.default_rng(0)
+    with h5py.File(fname, 'w') as h5file:
+        h5file.create_group('hardware/IDS/settings').attrs['frame_rate'] = 50.
+        dset = h5file.create_dataset('measurement/IDSmeasurement/t0/c0/image',
+                                     shape=[frames, *shape], dtype=np.uint16)
+        noise = rng.integers(0, 4096, (16, *shape)).astype(np.uint16)
+        for i in range(frames):
+            dset[i] = noise[i % 16]
+
+
+def replay(cam, frames, consumer=None):
+    cam.set_frame_num(frames)
+    cam.start_acquisition(buffersize=64)
+    t = time.perf_counter()
+    for _ in range(frames):
+        img = cam.get_frame()
+        if consumer is not None:
+            consumer(img)
+    elapsed = time.perf_counter() - t
+    cam.stop_acquisition()
+    return frames / elapsed
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmp:
+        if len(sys.argv) > 1:
+            fname = sys.argv[1]
+        else:
+            fname = os.path.join(tmp, 'stack.h5')
+            write_test_stack(fname)
+        cam = VirtualCamera(fname, speed='max')
+        frames = len(cam.stack)
+        print(f"{fname}: {cam.stack.shape} {cam.stack.dtype}, memory-mapped: {isinstance(cam.stack, np.memmap)}")
+        print(f"replay: {replay(cam, frames):.0f} fps")
+
+        writer = ZarrWriter(os.path.join(tmp, 'copy.zarr'), cam.stack.shape, cam.stack.dtype)
+        print(f"replay and Zarr saving: {replay(cam, frames, writer.write):.0f} fps")
+        writer.close()
+
+        cam.speed = 'recorded'
+        print(f"replay at recorded speed ({cam.frame_rate:.0f} fps): {replay(cam, 100):.1f} fps")
+        cam.close()
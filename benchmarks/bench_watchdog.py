@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Recording through StreamWatchdog on the emulated IDS peak backend, with transport faults 
+injected during the run: a stalled stream (recovered by restarting the data stream) 
+and a lost link (recovered by reopening the device). 
+Reports the gaps and the frame rate before and after the faults.
+
+    python benchmarks/bench_watchdog.py
+"""
+import os, sys, time, threading, tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import h5py
+import mock_ids_peak
+mock_ids_peak.INIT_DELAY = mock_ids_peak.UPDATE_DELAY = 0
+mock_ids_peak.install()
+from ids_library import Camera
+from stream_watchdog import StreamWatchdog
+
+FRAMES = 3000
+FRAME_RATE = 500.
+SHAPE = (128, 512)
+
+
+def inject(cam, delay, fault):
+    time.sleep(delay)
+    print(f"{time.perf_counter() - t0:.2f} s: injecting {fault.__name__}")
+    fault()
+
+
+if __name__ == '__main__':
+    cam = Camera()
+    cam.set_bit_depth(8)
+    cam.set_active_region(0, 0, SHAPE[1], SHAPE[0])
+    cam.set_exposure_ms(1)
+    cam.set_frame_rate(FRAME_RATE)
+    cam.set_frame_num(FRAMES)
+    cam.set_stream_mode("OldestFirst")
+    cam.start_acquisition(buffersize=200)
+    watchdog = StreamWatchdog(cam, stall_s=0.5)
+
+    t0 = time.perf_counter()
+    device = cam.device
+    threading.Thread(target=inject, args=(cam, 1.5, device.stall), daemon=True).start()
+    threading.Thread(target=inject, args=(cam, 3.5, device.fail_link), daemon=True).start()
+
+    rates = []
+    with tempfile.TemporaryDirectory() as tmp, h5py.File(os.path.join(tmp, 'bench.h5'), 'w') as h5file:
+        dset = h5file.create_dataset('t0/c0/image', shape=[FRAMES, *SHAPE], dtype='uint8')
+        written = 0
+        t = time.perf_counter()
+        while written < FRAMES:
+            block, _, _ = watchdog.get_frames(min(64, FRAMES - written))
+            dset[written:written+len(block)] = block
+            written += len(block)
+            if written % 512 < len(block): # about every 512 frames
+                now = time.perf_counter()
+                rates.append((now - t0, 512 / (now - t)))
+                t = now
+        watchdog.save_gaps(dset.attrs)
+        print(f"written {written} of {FRAMES} frames in {time.perf_counter() - t0:.2f} s")
+        for gap in dset.attrs.get('stream_gaps', []):
+            print(f"gap: {gap}")
+    for t, rate in rates:
+        print(f"{t:6.2f} s: {rate:.0f} fps")
+    cam.close()
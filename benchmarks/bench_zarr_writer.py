@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Throughput of the Zarr saving backend (ZarrWriter) with one and with several writer threads,
+compared with a single-threaded h5py write of the same chunks with the same Blosc compressor
+(through hdf5plugin, skipped if it is not installed) and with an uncompressed h5py write.
+The frames are synthetic 16-bit images with shot noise, written frame by frame as during a recording.
+
+    python benchmarks/bench_zarr_writer.py [--frames N] [--threads N]
+"""
+import os, sys, time, tempfile, argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import h5py
+from zarr_writer import ZarrWriter
+
+SHAPE = (512, 1024)
+CHUNK_FRAMES = 16
+CLEVEL = 5
+
+
+def make_frames(count):
+    """ A few distinct noisy frames, cycled: generating the frames must not be timed"""
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:SHAPE[0], 0:SHAPE[1]]
+    signal = 200 + 800 * np.exp(-((x - SHAPE[1]/2)**2 + (y - SHAPE[0]/2)**2) / (2 * 150**2))
+    return [rng.poisson(signal).astype(np.uint16) for _ in range(count)]
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def write_zarr(tmp, frames, count, threads, compressor):
+    path = os.path.join(tmp, f'bench_{threads}.zarr')
+    t = time.perf_counter()
+    writer = ZarrWriter(path, (count, *SHAPE), np.uint16, CHUNK_FRAMES, compressor, CLEVEL, threads)
+    for i in range(count):
+        writer.write(frames[i % len(frames)])
+    writer.close()
+    return time.perf_counter() - t, directory_size(path)
+
+
+def write_h5(tmp, frames, count, compression):
+    path = os.path.join(tmp, 'bench.h5')
+    t = time.perf_counter()
+    with h5py.File(path, 'w') as h5file:
+        dset = h5file.create_dataset('t0/c0/image', shape=(count, *SHAPE), dtype=np.uint16,
+                                     chunks=(CHUNK_FRAMES, *SHAPE), **compression)
+        block = np.empty((CHUNK_FRAMES, *SHAPE), dtype=np.uint16)
+        for start in range(0, count, CHUNK_FRAMES): # whole chunks, as ZarrWriter does
+            stop = min(start + CHUNK_FRAMES, count)
+            for i in range(start, stop):
+                block[i - start] = frames[i % len(frames)]
+            dset[start:stop] = block[:stop-start]
+    elapsed = time.perf_counter() - t
+    size = os.path.getsize(path)
+    os.remove(path)
+    return elapsed, size
+
+
+def report(name, elapsed, size, count):
+    raw = count * SHAPE[0] * SHAPE[1] * 2
+    print(f"{name:>28}: {count/elapsed:7.1f} fps, {raw/elapsed/1e6:7.1f} MB/s, ratio {raw/size:.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--frames', type=int, default=256)
+    parser.add_argument('--threads', type=int, default=os.cpu_count() or 4)
+    args = parser.parse_args()
+    frames = make_frames(8)
+    print(f"{args.frames} frames of {SHAPE[1]}x{SHAPE[0]} uint16, chunks of {CHUNK_FRAMES} frames, "
+          f"{os.cpu_count()} CPUs")
+    with tempfile.TemporaryDirectory() as tmp:
+        for threads in sorted({1, args.threads}):
+            elapsed, size = write_zarr(tmp, frames, args.frames, threads, 'blosc-lz4')
+            report(f'Zarr blosc-lz4, {threads} threads', elapsed, size, args.frames)
+        try:
+            import hdf5plugin
+            compression = hdf5plugin.Blosc(cname='lz4', clevel=CLEVEL, shuffle=hdf5plugin.Blosc.BITSHUFFLE)
+            elapsed, size = write_h5(tmp, frames, args.frames, dict(compression))
+            report('h5py blosc-lz4', elapsed, size, args.frames)
+        except ImportError:
+            print(f"{'h5py blosc-lz4':>28}: skipped, hdf5plugin is not installed")
+        elapsed, size = write_h5(tmp, frames, args.frames, {})
+        report('h5py uncompressed', elapsed, size, args.frames)
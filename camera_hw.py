@@ -5,7 +5,9 @@ Created on Mon May 5 16:33:32 2025
 @authors: Andrea Bassi, Yoginder Singh, Politecnico di Milano
 """
 from ScopeFoundry import HardwareComponent
-from ids_library import Camera, BitDepthChoices
+from ids_library import Camera, BitDepthChoices, pin_current_thread, restore_thread_affinity
+from auto_exposure import AutoExposureController
+from virtual_camera import VirtualCamera, SpeedChoices
 
 class IdsHW(HardwareComponent):
     
@@ -17,6 +19,12 @@ class IdsHW(HardwareComponent):
     def setup(self):
         # create Settings (aka logged quantities)   
         self.model = self.settings.New(name='model', dtype=str)
+        self.serial_number = self.settings.New(name='serial_number', dtype=str, initial='') # if empty, cam_num is used
+        self.keep_open = self.settings.New(name='keep_open', dtype=bool, initial=False) # keep the device open after disconnect, for a fast reconnect
+        self.virtual_file = self.settings.New(name='virtual_file', dtype='file', initial='', 
+                                              file_filters=['Stacks (*.h5 *.hdf5 *.npy)']) # if set, replays the file instead of the camera
+        self.virtual_speed = self.settings.New(name='virtual_speed', dtype=str, 
+                                               choices=SpeedChoices, initial='recorded', ro=False)
         self.temperature = self.settings.New(name='temperature', dtype=float, ro=True, unit=chr(176)+'C' )
         self.image_width = self.settings.New(name='image_width', dtype=int, ro=False,unit='px', reread_from_hardware_after_write=True)
         self.image_height = self.settings.New(name='image_height', dtype=int, ro=False,unit='px', reread_from_hardware_after_write=True)
@@ -50,7 +58,7 @@ class IdsHW(HardwareComponent):
                                              
         
         self.trigger_source = self.settings.New(name='trigger_source', dtype=str,
-                                                choices=['Internal', 'External'],
+                                                choices=['Internal', 'External', 'Software'],
                                                 initial='Internal', ro=False,
                                                 reread_from_hardware_after_write=True)
 
@@ -59,10 +67,67 @@ class IdsHW(HardwareComponent):
                                                 spinbox_step=0.1, spinbox_decimals=2,
                                                 unit='ms', ro=False,
                                                 reread_from_hardware_after_write=True)
+        
+        self.trigger_rate = self.settings.New(name='trigger_rate', dtype=float,
+                                                initial=10.0, vmin=0.01, vmax=10000.0,
+                                                spinbox_step=1.0, unit='Hz', ro=False)
+        
+        self.trigger_count = self.settings.New(name='trigger_count', dtype=int,
+                                                initial=0, vmin=0, ro=False) # 0 runs until stopped
+        
+        self.trigger_achieved_rate = self.settings.New(name='trigger_achieved_rate', dtype=float,
+                                                initial=0., unit='Hz', ro=True)
+        
+        self.trigger_jitter = self.settings.New(name='trigger_jitter', dtype=float,
+                                                initial=0., spinbox_decimals=4, unit='ms', ro=True)
+        
+        self.output_line = self.settings.New(name='output_line', dtype=str,
+                                                choices=['Off', 'Line1', 'Line2', 'Line3'],
+                                                initial='Off', ro=False)
+        
+        self.auto_exposure = self.settings.New(name='auto_exposure', dtype=bool, initial=False, ro=False)
+        self.ae_target = self.settings.New(name='ae_target', dtype=float, initial=0.5,
+                                                vmin=0.01, vmax=1.0, spinbox_step=0.05, ro=False) # fraction of full scale
+        self.ae_percentile = self.settings.New(name='ae_percentile', dtype=float, initial=99.0,
+                                                vmin=1.0, vmax=100.0, ro=False)
+        self.ae_damping = self.settings.New(name='ae_damping', dtype=float, initial=0.5,
+                                                vmin=0.05, vmax=1.0, spinbox_step=0.05, ro=False)
+        self.ae_interval = self.settings.New(name='ae_interval', dtype=int, initial=5,
+                                                vmin=1, ro=False) # frames between corrections
+        self.ae_max_exposure = self.settings.New(name='ae_max_exposure', dtype=float, initial=100.,
+                                                vmin=0.01, unit='ms', ro=False)
+        self.ae_level = self.settings.New(name='ae_level', dtype=float, initial=0.,
+                                                spinbox_decimals=3, ro=True)
+        
+        self.low_latency = self.settings.New(name='low_latency', dtype=bool, initial=False, ro=False)
+        self.grab_cpu = self.settings.New(name='grab_cpu', dtype=int, initial=-1,
+                                                vmin=-1, ro=False) # core of the grabbing thread, -1 not pinned
+        self.latency_p50 = self.settings.New(name='latency_p50', dtype=float,
+                                                initial=0., spinbox_decimals=3, unit='ms', ro=True)
+        self.latency_p99 = self.settings.New(name='latency_p99', dtype=float,
+                                                initial=0., spinbox_decimals=3, unit='ms', ro=True)
+        self.latency_max = self.settings.New(name='latency_max', dtype=float,
+                                                initial=0., spinbox_decimals=3, unit='ms', ro=True)
+        self.ae_controller = AutoExposureController()
+        self._ae_frame_count = 0
+        self._grab_affinity = None # affinity of the grabbing thread before pin_grab_thread
+        
+        self.add_operation('start_trigger', self.start_software_trigger)
+        self.add_operation('stop_trigger', self.stop_software_trigger)
+        self.add_operation('update_latency', self.update_latency_stats)
+        self.add_operation('reset_latency', self.reset_latency)
     
     def connect(self):
         # create an instance of the Device
-        self.camera_device = Camera(cam_num=self.cam_num, debug=self.settings['debug_mode'])
+        if self.settings['virtual_file']:
+            self.camera_device = VirtualCamera(self.settings['virtual_file'], 
+                                               speed=self.settings['virtual_speed'],
+                                               debug=self.settings['debug_mode'])
+        else:
+            self.camera_device = Camera(cam_num=self.cam_num, debug=self.settings['debug_mode'],
+                                        serial=self.settings['serial_number'] or None,
+                                        keep_open=self.settings['keep_open'])
+            self.settings['serial_number'] = self.camera_device.get_serial()
         
         # connect settings to Device methods
         self.model.hardware_read_func = self.camera_device.get_model
@@ -72,21 +137,22 @@ class IdsHW(HardwareComponent):
         self.image_offsetx.hardware_read_func = self.camera_device.get_offsetx
         self.image_offsety.hardware_read_func = self.camera_device.get_offsety
         
-        self.image_width.hardware_set_func = self.camera_device.set_width
-        self.image_height.hardware_set_func = self.camera_device.set_height
-        self.image_offsetx.hardware_set_func = self.camera_device.set_offsetx
-        self.image_offsety.hardware_set_func = self.camera_device.set_offsety
+        # setters go through the change queue of the camera, so that they are safe while grabbing
+        self.image_width.hardware_set_func = self.live_setter('width')
+        self.image_height.hardware_set_func = self.live_setter('height')
+        self.image_offsetx.hardware_set_func = self.live_setter('offsetx')
+        self.image_offsety.hardware_set_func = self.live_setter('offsety')
 
-        self.bit_depth.hardware_set_func = self.camera_device.set_bit_depth
+        self.bit_depth.hardware_set_func = self.live_setter('bit_depth')
         self.bit_depth.hardware_read_func = self.camera_device.get_bit_depth
         
         self.exposure_time.hardware_read_func = self.camera_device.get_exposure_ms
-        self.exposure_time.hardware_set_func = self.camera_device.set_exposure_ms
+        self.exposure_time.hardware_set_func = self.live_setter('exposure_ms')
         
         self.frame_rate.hardware_read_func = self.camera_device.get_frame_rate
-        self.frame_rate.hardware_set_func = self.camera_device.set_frame_rate
+        self.frame_rate.hardware_set_func = self.live_setter('frame_rate')
         
-        self.gain.hardware_set_func = self.camera_device.set_gain
+        self.gain.hardware_set_func = self.live_setter('gain')
         self.gain.hardware_read_func = self.camera_device.get_gain
         
         self.debug_mode.hardware_read_func = self.camera_device.get_debug_mode
@@ -100,13 +166,137 @@ class IdsHW(HardwareComponent):
 
         self.trigger_source.hardware_set_func = self.camera_device.set_trigger_source
         self.trigger_source.hardware_read_func = self.camera_device.get_trigger_source
-        #self.trigger_delay.hardware_set_func = self.camera_device.set_trigger_delay
-        #self.trigger_delay.hardware_read_func = self.camera_device.get_trigger_delay
+        self.trigger_delay.hardware_set_func = self.camera_device.set_trigger_delay
+        self.trigger_delay.hardware_read_func = self.camera_device.get_trigger_delay
+        
+        self.output_line.hardware_set_func = self.set_output_line
+        
+        self.low_latency.hardware_set_func = self.set_low_latency
+        self.low_latency.hardware_read_func = self.camera_device.get_low_latency
         
         self.read_from_hardware()
         
+    def live_setter(self, name):
+        def setter(value):
+            self.camera_device.queue_change(name, value)
+        return setter
+
+    def set_output_line(self, line):
+        """
+        Drives the selected IO line with ExposureActive, releasing the previously used one
+        """
+        previous = getattr(self, '_active_output_line', None)
+        if previous is not None and previous != line:
+            self.camera_device.set_line_output(previous, "Off")
+            self._active_output_line = None
+        if line != 'Off':
+            self.camera_device.set_line_output(line, "ExposureActive")
+            self._active_output_line = line
+
+    def start_software_trigger(self):
+        """
+        Issues software triggers at trigger_rate, 
+        trigger_count times or until stop_trigger if trigger_count is 0
+        """
+        if not hasattr(self, 'camera_device'):
+            return
+        self.trigger_source.update_value('Software')
+        count = self.settings['trigger_count'] or None
+        # a task with a fixed count ends by itself and reports its statistics when done
+        self.camera_device.start_trigger_task(self.settings['trigger_rate'], count,
+                                              on_done=self.update_trigger_stats)
+
+    def stop_software_trigger(self):
+        if not hasattr(self, 'camera_device'):
+            return
+        self.camera_device._stop_trigger_task()
+        self.update_trigger_stats()
+
+    def update_trigger_stats(self):
+        stats = self.camera_device.get_trigger_stats()
+        self.trigger_achieved_rate.update_value(stats['rate'])
+        self.trigger_jitter.update_value(stats['jitter_ms'])
+
+    def set_low_latency(self, enable):
+        """
+        Low-latency mode for closed-loop experiments, effective at the next acquisition start. 
+        The stream mode is switched to NewestOnly and back to the selected one.
+        """
+        cam = self.camera_device
+        if enable and not cam.get_low_latency():
+            self._stream_mode_before_low_latency = self.settings['stream_mode']
+        elif not enable and cam.get_low_latency():
+            cam.set_stream_mode(getattr(self, '_stream_mode_before_low_latency', self.settings['stream_mode']))
+        cam.set_low_latency(enable)
+        self.stream_mode.read_from_hardware()
+
+    def pin_grab_thread(self):
+        """ Pins the calling (grabbing) thread to the grab_cpu core, if it is not -1"""
+        cpu = self.settings['grab_cpu']
+        if cpu >= 0 and self._grab_affinity is None:
+            self._grab_affinity = pin_current_thread(cpu)
+
+    def unpin_grab_thread(self):
+        """ Restores the affinity of the thread pinned by pin_grab_thread,
+        so that the threads it starts (writers, trigger pacer) are not confined to grab_cpu"""
+        if self._grab_affinity is not None:
+            restore_thread_affinity(self._grab_affinity)
+            self._grab_affinity = None
+
+    def update_latency_stats(self):
+        if not hasattr(self, 'camera_device'):
+            return
+        stats = self.camera_device.get_latency_stats()
+        self.latency_p50.update_value(stats['p50'])
+        self.latency_p99.update_value(stats['p99'])
+        self.latency_max.update_value(stats['max'])
+
+    def reset_latency(self):
+        if hasattr(self, 'camera_device'):
+            self.camera_device.reset_latency()
+
+    def get_latency_histogram(self, bins=50):
+        """
+        Returns (counts, bin_edges) of the latencies (ms) between the end of the exposure 
+        and the frame available in Python, measured in low_latency mode
+        """
+        return self.camera_device.get_latency_histogram(bins)
+
+    def update_auto_exposure(self, img):
+        """
+        Feeds a frame to the auto-exposure controller. 
+        Every ae_interval frames, exposure (and gain, when exposure is at its maximum) 
+        are corrected towards ae_target, through set_exposure_ms and set_gain.
+        """
+        self._ae_frame_count += 1
+        if self._ae_frame_count < self.settings['ae_interval']:
+            return
+        self._ae_frame_count = 0
+        ae = self.ae_controller
+        ae.target = self.settings['ae_target']
+        ae.percentile = self.settings['ae_percentile']
+        ae.damping = self.settings['ae_damping']
+        
+        cam = self.camera_device
+        max_exposure = min(self.settings['ae_max_exposure'], cam.get_max_exposure_ms())
+        result = ae.update(img, self.settings['exposure_time'], self.settings['gain'],
+                           full_scale = 2**self.settings['bit_depth'] - 1,
+                           max_exposure_ms = max_exposure,
+                           max_gain = min(cam.get_max_gain(), self.gain.vmax))
+        self.ae_level.update_value(ae.level)
+        if result is None:
+            return
+        exposure, gain = result
+        self.exposure_time.update_value(exposure)
+        if gain != self.settings['gain']:
+            self.gain.update_value(gain)
+
     def disconnect(self):
         if hasattr(self, 'camera_device'):
+            self._active_output_line = None
+            if not self.settings['virtual_file']:
+                # without keep_open the device is released, so that other programs can open it
+                self.camera_device.keep_open = self.settings['keep_open']
             self.camera_device.close() 
             del self.camera_device
             
@@ -7,9 +7,24 @@ Created on Mon May 5 16:33:32 2025
 from ScopeFoundry import Measurement
 from ScopeFoundry.helper_funcs import sibling_path, load_qt_ui_file
 from ScopeFoundry import h5_io
+from qtpy import QtCore
 import pyqtgraph as pg
 import numpy as np
 import os, time
+from zarr_writer import ZarrWriter, CompressorChoices
+from auto_exposure import sparse_percentiles
+from frame_server import FrameServer
+from stack_browser import StackBrowser, ThumbnailWriter, ThumbnailLevels
+from stream_watchdog import StreamWatchdog
+from timelapse import TimeLapse, ModeChoices
+
+class FrameNotifier(QtCore.QObject):
+    """
+    Lives in the GUI thread: frame_ready emitted by the acquisition thread
+    is delivered to the GUI through a queued connection
+    """
+    frame_ready = QtCore.Signal()
+
 
 class IdsMeasure(Measurement):
     
@@ -25,14 +40,49 @@ class IdsMeasure(Measurement):
         self.ui_filename = sibling_path(__file__, "camera.ui")
         self.ui = load_qt_ui_file(self.ui_filename) 
         
-        self.settings.New('refresh_period', dtype = float, unit ='s', spinbox_decimals = 3, initial = 0.08, vmin = 0) 
-        self.settings.New('saving_type', dtype=str, initial='None', choices=['None', 'Stack'])
+        self.settings.New('refresh_period', dtype = float, unit ='s', spinbox_decimals = 3, initial = 0.02, vmin = 0) # minimum time between redraws
+        self.settings.New('display_rate', dtype = float, unit ='fps', initial = 0., ro = True)
+        self.settings.New('saving_type', dtype=str, initial='None', choices=['None', 'Stack', 'Burst', 'Zarr', 'TimeLapse'])
         
         self.frame_num = self.settings.New(name='frame_num',initial= 10, spinbox_step = 1,
                                            dtype=int, ro=False)  
         
         self.settings.New(name='buffer_size',initial= 1000, spinbox_step = 1,
                                            dtype=int, ro=False) 
+        
+        self.settings.New(name='batch_size',initial= 64, spinbox_step = 1, vmin = 1,
+                                           dtype=int, ro=False) # maximum frames per get_frames call
+        
+        self.settings.New(name='burst_memory', initial= 2048, spinbox_step = 64, unit = 'MB',
+                                           dtype=int, vmin=1, ro=False)
+        self.settings.New(name='burst_max_frames', initial= 0, dtype=int, ro=True)
+        self.settings.New(name='capture_rate', initial= 0., unit = 'fps', dtype=float, ro=True)
+
+        self.settings.New(name='zarr_chunk_frames', initial= 16, spinbox_step = 1,
+                                           dtype=int, vmin=1, ro=False)
+        self.settings.New(name='zarr_compressor', dtype=str, initial='blosc-lz4', 
+                                           choices=CompressorChoices, ro=False)
+        self.settings.New(name='zarr_threads', initial= 4, spinbox_step = 1,
+                                           dtype=int, vmin=1, ro=False)
+
+        self.settings.New(name='tl_points', initial= 10, dtype=int, vmin=1, ro=False) # time points
+        self.settings.New(name='tl_interval', initial= 1.0, unit = 's', dtype=float, vmin=0.001,
+                                           spinbox_decimals = 3, ro=False)
+        self.settings.New(name='tl_frames', initial= 1, dtype=int, vmin=1, ro=False) # frames per time point
+        self.settings.New(name='tl_mode', dtype=str, initial='MultiFrame', choices=ModeChoices, ro=False)
+        self.settings.New(name='tl_jitter', initial= 0., unit = 'ms', dtype=float, spinbox_decimals = 3, ro=True)
+        self.settings.New(name='tl_overhead', initial= 0., unit = 'ms', dtype=float, spinbox_decimals = 3, ro=True)
+
+        self.settings.New('watchdog', dtype=bool, initial=True) # restart the stream after transport faults while recording
+        self.settings.New('stall_timeout', dtype=float, unit='s', initial=2.0, vmin=0.1) # time without frames before a restart
+
+        self.settings.New('publish_frames', dtype=bool, initial=False) # shared-memory broadcast to other processes
+
+        self.settings.New('thumbnails', dtype=bool, initial=True) # save a low resolution pyramid for playback
+        self.settings.New('playback_file', dtype='file', initial='', file_filters=['HDF5 (*.h5)'])
+        self.settings.New('playback_frame', dtype=int, initial=0, vmin=0)
+        self.settings.New('playback_level', dtype=int, initial=0, vmin=0, vmax=ThumbnailLevels) # 0 is full resolution
+        self.settings.New('playback_cache', dtype=int, initial=64, vmin=1, unit='frames')
 
         self.settings.New('zoom', dtype=int, initial=50, vmin=25, vmax=100)
         self.settings.New('rotate', dtype=bool, initial=True)     
@@ -48,6 +98,19 @@ class IdsMeasure(Measurement):
         
         self.camera = self.app.hardware['IDS'] 
         
+        self.settings.burst_memory.add_listener(self.get_burst_capacity)
+        # the capacity follows the frame size
+        self.camera.settings.image_width.add_listener(self.get_burst_capacity)
+        self.camera.settings.image_height.add_listener(self.get_burst_capacity)
+        self.camera.settings.bit_depth.add_listener(self.get_burst_capacity)
+        self.settings.publish_frames.add_listener(self.set_frame_server)
+        self.frame_server = None
+        self.settings.playback_file.add_listener(self.open_playback)
+        self.settings.playback_frame.add_listener(self.show_playback_frame)
+        self.settings.playback_level.add_listener(self.show_playback_frame)
+        self.add_operation('open_last_recording', self.open_last_recording)
+        self.browser = None
+        
     def setup_figure(self):
         """
         Runs once during App initialization, after setup()
@@ -81,46 +144,114 @@ class IdsMeasure(Measurement):
         cmap = pg.ColorMap(pos=np.linspace(0.0, 1.0, 6), color=colors)
         self.imv.setColorMap(cmap)
         self.screen_width = self.ui.screen().size().width() # Get screen width to be used for zooming
+        
+        self.notifier = FrameNotifier()
+        self.notifier.frame_ready.connect(self.on_new_frame)
+        self._redraw_pending = False
+        self._last_redraw = 0
+        self._render_time = 0
 
         
     def update_display(self):
         """
-        Displays (plots) the numpy array self.buffer. 
+        Updates zoom and progress.
         This function runs repeatedly and automatically during the measurement run.
-        its update frequency is defined by self.display_update_period
+        its update frequency is defined by self.display_update_period.
+        Frames are drawn by on_new_frame, when they arrive.
         """
-        self.display_update_period = self.settings['refresh_period'] 
+        self.display_update_period = 0.2 
        
         length = self.frame_num.val
+        if self.settings['saving_type'] == 'TimeLapse':
+            length = self.settings['tl_points']
 
         if self.settings.saving_type.val == 'None':
             self.screen_width = self.ui.screen().size().width()
             width = int(self.screen_width*self.settings['zoom']/100)
             self.ui.setFixedWidth(width)
         
-        if self.settings['saving_type'] == 'Stack' and hasattr(self,'frame_index'):
+        if self.settings['saving_type'] in ('Stack', 'Burst', 'Zarr', 'TimeLapse') and hasattr(self,'frame_index'):
             self.settings['progress'] = (self.frame_index +1) * 100/length
+
+    def new_frame(self, img):
+        """
+        Called by the acquisition thread for each frame. 
+        Requests a redraw only if none is pending, so that at most one redraw is queued
+        and the GUI always draws the newest frame.
+        """
+        self.img = img
+        if not self._redraw_pending:
+            self._redraw_pending = True
+            self.notifier.frame_ready.emit()
+
+    def on_new_frame(self):
+        """
+        Draws the newest frame, in the GUI thread.
+        Redraws are spaced by at least refresh_period and by twice the time taken to render,
+        so that the display rate adapts to what the GUI can sustain.
+        """
+        now = time.perf_counter()
+        min_interval = max(self.settings['refresh_period'], 2*self._render_time)
+        wait = self._last_redraw + min_interval - now
+        if wait > 0:
+            QtCore.QTimer.singleShot(int(wait*1000)+1, self.on_new_frame)
+            return
+        self._redraw_pending = False # frames arriving while drawing request a new redraw
+        self.show_image(self.img)
+        t = time.perf_counter()
+        self._render_time = 0.8*self._render_time + 0.2*(t-now)
+        if self._last_redraw:
+            rate = 1/(t - self._last_redraw)
+            self.settings['display_rate'] = 0.9*self.settings['display_rate'] + 0.1*rate
+        self._last_redraw = t
+    
+    def show_image(self, img):
+        """
+        Displays img in the image view, with the rotation and levels settings
+        """
         
-        if hasattr(self,'img'):
+        if self.settings['rotate']:   
+            img=img.T
 
-            img=self.img
+        self.imv.setImage(img,
+                        autoLevels = False,
+                        autoRange = self.settings['auto_range'],
+                        levelMode = 'mono'
+                        )
             
-            if self.settings['rotate']:   
-                img=img.T
-
-            self.imv.setImage(img,
-                            autoLevels = self.settings['auto_levels'],
-                            autoRange = self.settings['auto_range'],
-                            levelMode = 'mono'
-                            )
-                
-            if self.settings['auto_levels']:
-                lmin,lmax = self.imv.getHistogramWidget().getLevels()
-                self.settings['level_min'] = lmin
-                self.settings['level_max'] = lmax
-            else:
-                self.imv.setLevels( min= self.settings['level_min'],
-                                    max= self.settings['level_max'])
+        if self.settings['auto_levels']:
+            # levels from a subsampled grid, instead of scanning the full frame
+            lmin,lmax = sparse_percentiles(img, [0.1, 99.9])
+            self.settings['level_min'] = lmin
+            self.settings['level_max'] = lmax
+        self.imv.setLevels( min= self.settings['level_min'],
+                            max= self.settings['level_max'])
+
+    def open_playback(self):
+        """
+        Opens playback_file for browsing with playback_frame
+        """
+        if self.browser is not None:
+            self.browser.close()
+            self.browser = None
+        fname = self.settings['playback_file']
+        if not fname:
+            return
+        self.browser = StackBrowser(fname, cache_frames=self.settings['playback_cache'])
+        self.settings.playback_frame.change_min_max(0, self.browser.length - 1)
+        self.settings.playback_level.change_min_max(0, max([0] + self.browser.levels))
+        self.show_playback_frame()
+
+    def open_last_recording(self):
+        if hasattr(self, 'last_fname'):
+            self.settings['playback_file'] = self.last_fname
+
+    def show_playback_frame(self):
+        if self.browser is None or self.is_measuring():
+            return
+        img = self.browser.get_thumbnail(self.settings['playback_frame'], 
+                                         self.settings['playback_level'])
+        self.show_image(img)
                 
     
     def measure(self):
@@ -136,31 +267,300 @@ class IdsMeasure(Measurement):
         self.frame_index = 0
         
         self.camera.camera_device.start_acquisition(buffersize=self.settings.buffer_size.val)
+        grabber = self.get_grabber()
 
         self.create_h5_file()
 
         t = time.perf_counter()
+        
+        batch_size = self.get_batch_size()
+        frame_idx = 0
+        try:
+            while frame_idx < frame_num:
+                
+                n = min(batch_size, frame_num - frame_idx)
+                block, frame_ids, timestamps = grabber.get_frames(n)
+                n = len(block)
+                if self.camera.settings['debug_mode']:
+                    print(frame_ids)
+                self.new_frame(block[-1].copy()) # the block is reused by the next get_frames
+                self.publish_block(block, frame_ids, timestamps)
+                
+                self.frame_index = frame_idx + n - 1
+
+                if self.interrupt_measurement_called:
+                    break
+                
+                if block.shape[1:] != self.image_h5.shape[1:] or block.dtype != self.image_h5.dtype:
+                    print('Frame size or bit depth changed during the recording: recording stopped')
+                    break
+                        
+                self.image_h5[frame_idx:frame_idx+n,:,:] = block
+                if self.thumbnail_writer is not None:
+                    self.thumbnail_writer.write(slice(frame_idx, frame_idx+n), block)
+                frame_idx += n
+        except InterruptedError as e:
+            print(f'Recording interrupted: {e}')
+        finally:
+            # the frames written so far are kept, also when the stream cannot be recovered
+            if frame_idx < frame_num:
+                self.image_h5.attrs['frames_written'] = frame_idx
+            self.save_change_log(self.image_h5.attrs)
+            self.save_gaps(grabber, self.image_h5.attrs)
+            self.h5file.flush()
+            self.camera.camera_device.stop_acquisition()
+            self.camera.camera_device.set_acquisition_mode("Continuous")
+            self.h5file.close()
+            self.settings['saving_type'] = 'None'
+
+    def get_grabber(self):
+        """
+        Returns the object the recordings read the frames from: 
+        the camera, or a StreamWatchdog on it if the watchdog setting is on.
+        Call after start_acquisition
+        """
+        cam = self.camera.camera_device
+        if self.settings['watchdog']:
+            return StreamWatchdog(cam, stall_s = self.settings['stall_timeout'],
+                                  interrupted = lambda: self.interrupt_measurement_called)
+        return cam
+
+    def save_gaps(self, grabber, attrs):
+        if isinstance(grabber, StreamWatchdog):
+            grabber.save_gaps(attrs)
+
+    def get_batch_size(self):
+        """
+        Frames collected per get_frames call during recordings: 
+        at most batch_size, and spanning at most about 50 ms, to keep the display live
+        """
+        frame_rate = self.camera.camera_device.get_frame_rate()
+        return max(1, min(self.settings['batch_size'], int(frame_rate * 0.05)))
 
-        for frame_idx in range(frame_num):
+    def measure_zarr(self):
+        """
+        Acquire frame_num frames and save them in a chunked Zarr store,
+        compressing the chunks in parallel
+        """
+        cam = self.camera.camera_device
+        frame_num  = self.frame_num.val
+        cam.set_acquisition_mode("MultiFrame")
+        cam.set_frame_num(frame_num)
+        cam.set_stream_mode("OldestFirst")
+
+        self.frame_index = 0
+        self.create_saving_directory()
+        writer = ZarrWriter(self.get_file_name('.zarr'),
+                            shape = [frame_num, cam.get_height(), cam.get_width()],
+                            dtype = cam.get_frame_dtype(),
+                            chunk_frames = self.settings['zarr_chunk_frames'],
+                            compressor = self.settings['zarr_compressor'],
+                            threads = self.settings['zarr_threads'],
+                            element_size_um = [self.settings['zsampling'],self.settings['ysampling'],self.settings['xsampling']])
         
-            img = self.camera.camera_device.get_frame()
-            if self.camera.settings['debug_mode']:
-                print(self.camera.camera_device.frame_id)
-            self.img = img
-            
-            self.frame_index = frame_idx
+        cam.start_acquisition(buffersize=self.settings.buffer_size.val)
+        grabber = self.get_grabber()
+        batch_size = self.get_batch_size()
+        try:
+            while writer.frames_written < frame_num:
+                # the frames are copied from the camera buffers directly into the chunk being filled
+                view = writer.next_frames(min(batch_size, frame_num - writer.frames_written))
+                try:
+                    frames, frame_ids, timestamps = grabber.get_frames(len(view), out=view)
+                except ValueError:
+                    print('Frame size or bit depth changed during the recording: recording stopped')
+                    break
+                except InterruptedError as e:
+                    print(f'Recording interrupted: {e}')
+                    break
+                writer.commit(len(frames))
+                self.new_frame(frames[-1].copy()) # the chunk is reused after it is written
+                self.publish_block(frames, frame_ids, timestamps)
+                self.frame_index = writer.frames_written - 1
+                if self.interrupt_measurement_called:
+                    break
+        finally:
+            cam.stop_acquisition()
+            cam.set_acquisition_mode("Continuous")
+            writer.close()
+            if writer.frames_written < frame_num:
+                writer.array.attrs['frames_written'] = writer.frames_written
+            self.save_change_log(writer.array.attrs)
+            self.save_gaps(grabber, writer.array.attrs)
+            self.settings['saving_type'] = 'None'
+
+    def save_change_log(self, attrs):
+        """
+        Stores the settings changed during the recording, as 'frame_index name value' strings
+        """
+        change_log = self.camera.camera_device.change_log
+        if change_log:
+            attrs['live_changes'] = [f'{index} {name} {value}' for index, name, value in change_log]
+
+    def set_frame_server(self):
+        """
+        Starts or stops the shared-memory frame server, following the publish_frames setting
+        """
+        if self.settings['publish_frames'] and self.frame_server is None:
+            self.frame_server = FrameServer()
+        elif not self.settings['publish_frames'] and self.frame_server is not None:
+            server = self.frame_server
+            self.frame_server = None
+            server.close()
+
+    def publish_frame(self, img, frame_id=None, timestamp_ns=None):
+        server = self.frame_server
+        if server is not None:
+            server.publish(img, frame_id, timestamp_ns)
+
+    def publish_block(self, block, frame_ids, timestamps):
+        """ Publishes every frame of a get_frames block, with its frame id and device timestamp"""
+        server = self.frame_server
+        if server is not None:
+            for img, frame_id, timestamp_ns in zip(block, frame_ids, timestamps):
+                server.publish(img, int(frame_id), int(timestamp_ns))
+
+    def get_burst_capacity(self):
+        """
+        Returns the number of frames with the current ROI and bit depth
+        that fit in the burst_memory budget
+        """
+        if not hasattr(self.camera, 'camera_device'):
+            return 0
+        # from the settings, which follow the live changes as soon as they are applied
+        hw = self.camera.settings
+        itemsize = 1 if hw['bit_depth'] <= 8 else 2
+        frame_bytes = max(1, hw['image_width'] * hw['image_height'] * itemsize)
+        max_frames = int(self.settings['burst_memory'] * 1024**2 // frame_bytes)
+        self.settings['burst_max_frames'] = max_frames
+        return max_frames
+
+    def measure_burst(self):
+        """
+        Acquire up to frame_num frames into a preallocated RAM block, 
+        with no disk access during capture, and flush them to h5 afterwards
+        """
+        cam = self.camera.camera_device
+        frame_num = min(self.frame_num.val, self.get_burst_capacity())
+        if frame_num < 1:
+            print('Burst memory too small for a single frame')
+            self.settings['saving_type'] = 'None'
+            return
+        if frame_num < self.frame_num.val:
+            print(f'Burst limited to {frame_num} frames by the memory budget')
+        
+        # allocate and touch the whole block now, so that no page faults occur during capture 
+        block = np.empty([frame_num, cam.get_height(), cam.get_width()], dtype=cam.get_frame_dtype())
+        block.fill(0)
+        
+        cam.set_acquisition_mode("MultiFrame")
+        cam.set_frame_num(frame_num)
+        cam.set_stream_mode("OldestFirst")
 
-            if self.interrupt_measurement_called:
-                break
-                    
-            self.image_h5[frame_idx,:,:] = img
+        self.frame_index = 0
+        captured = 0
+        
+        cam.start_acquisition(buffersize=self.settings.buffer_size.val)
+        grabber = self.get_grabber()
+        t = time.perf_counter()
+        
+        batch_size = self.get_batch_size()
+        try:
+            while captured < frame_num:
+                n = min(batch_size, frame_num - captured)
+                frames, _, _ = grabber.get_frames(n, out=block[captured:captured+n])
+                captured += len(frames)
+                self.frame_index = captured - 1
+                self.new_frame(block[captured-1])
+                if self.interrupt_measurement_called:
+                    break
+        except cam.stream_errors + (ValueError, InterruptedError) as e:
+            # stream faults, a change of frame size (get_frames) or Interrupt while the watchdog recovers
+            print(f'Burst interrupted: saving the {captured} frames captured ({e})')
+        
+        elapsed = time.perf_counter() - t
+        cam.stop_acquisition()
+        cam.set_acquisition_mode("Continuous")
+        if elapsed > 0:
+            self.settings['capture_rate'] = captured / elapsed
+        print(f'Burst: captured {captured} frames at {self.settings["capture_rate"]:.1f} fps')
+        if captured == 0:
+            self.settings['saving_type'] = 'None'
+            return
         
-        self.h5file.flush()
-        self.camera.camera_device.stop_acquisition()
-        self.camera.camera_device.set_acquisition_mode("Continuous")
-        self.h5file.close()
-        self.settings['saving_type'] = 'None'
+        self.create_h5_file(length=captured, frame_shape=block.shape[1:], dtype=block.dtype)
+        try:
+            # flush in large contiguous slabs of about 256 MB
+            slab = max(1, int(256 * 1024**2 // block[0].nbytes))
+            for start in range(0, captured, slab):
+                stop = min(start + slab, captured)
+                self.image_h5[start:stop,:,:] = block[start:stop]
+                if self.thumbnail_writer is not None:
+                    self.thumbnail_writer.write(slice(start, stop), block[start:stop])
+            self.save_change_log(self.image_h5.attrs)
+            self.save_gaps(grabber, self.image_h5.attrs)
+            self.h5file.flush()
+        finally:
+            self.h5file.close()
+            self.settings['saving_type'] = 'None'
 
+    def measure_timelapse(self):
+        """
+        Acquire tl_frames frames at each of tl_points time points, tl_interval apart,
+        in a single h5 file with one t<n>/c0/image dataset per time point.
+        The camera is armed once for the whole run, see timelapse.TimeLapse
+        """
+        cam = self.camera.camera_device
+        points = self.settings['tl_points']
+        self.frame_index = -1
+        self.create_timelapse_file(points, self.settings['tl_frames'])
+        timelapse = TimeLapse(cam, points, self.settings['tl_interval'],
+                              frames = self.settings['tl_frames'], mode = self.settings['tl_mode'])
+        
+        def write(n, block):
+            self.timelapse_h5[n][...] = block
+            self.new_frame(block[-1].copy()) # the block is reused by the next time point
+            for img in block:
+                self.publish_frame(img)
+            self.frame_index = n
+        
+        try:
+            acquired = timelapse.run(write, interrupted = lambda: self.interrupt_measurement_called)
+            print(f'Time-lapse: acquired {acquired} of {points} time points')
+        finally:
+            stats = timelapse.get_stats()
+            self.settings['tl_jitter'] = stats['jitter_ms']
+            self.settings['tl_overhead'] = stats['overhead_ms']
+            start_times = timelapse.start_times
+            for n, t_start in enumerate(start_times):
+                self.timelapse_h5[n].attrs['start_s'] = t_start - start_times[0]
+            for key, value in stats.items():
+                self.h5_group.attrs[f'timelapse_{key}'] = value
+            self.save_change_log(self.h5_group.attrs)
+            self.h5file.flush()
+            self.h5file.close()
+            self.settings['saving_type'] = 'None'
+
+    def create_timelapse_file(self, points, frames):
+        """
+        Creates the h5 file with the t<n>/c0/image datasets of all the time points, 
+        so that no allocation is made during the time-lapse
+        """
+        cam = self.camera.camera_device
+        self.create_saving_directory()
+        fname = self.get_file_name('.h5')
+        
+        self.h5file = h5_io.h5_base_file(app=self.app, measurement=self, fname = fname)
+        self.h5_group = h5_io.h5_create_measurement_group(measurement=self, h5group=self.h5file)
+        
+        self.timelapse_h5 = []
+        for n in range(points):
+            dset = self.h5_group.create_dataset(name  = f't{n}/c0/image', 
+                                                shape = [frames, cam.get_height(), cam.get_width()],
+                                                dtype = cam.get_frame_dtype())
+            dset.attrs['element_size_um'] =  [self.settings['zsampling'],self.settings['ysampling'],self.settings['xsampling']]
+            self.timelapse_h5.append(dset)
+        self.last_fname = fname
     
     def run(self):
         """
@@ -174,23 +574,53 @@ class IdsMeasure(Measurement):
             self.frame_index = -1
             self.camera.camera_device.set_acquisition_mode("Continuous")
             self.camera.camera_device.set_stream_mode("NewestOnly")
-            self.camera.camera_device.start_acquisition() 
+            self.camera.camera_device.start_acquisition(live=True) 
+            self.camera.pin_grab_thread()
+            t_latency = time.perf_counter()
             
             while not self.interrupt_measurement_called:
                      
-                self.img = self.camera.camera_device.get_frame()
+                self.new_frame(self.camera.camera_device.get_frame())
+                
+                if self.camera.settings['low_latency'] and time.perf_counter() - t_latency > 1.0:
+                    self.camera.update_latency_stats()
+                    t_latency = time.perf_counter()
+                
+                self.publish_frame(self.img)
+                
+                if self.camera.settings['auto_exposure']:
+                    self.camera.update_auto_exposure(self.img)
                 
                 if self.interrupt_measurement_called:
                     self.camera.camera_device.stop_acquisition() 
                     break
                 
+                if self.settings['saving_type'] != 'None':
+                    # the recordings start writer and trigger threads, which must not inherit the grab core
+                    self.camera.unpin_grab_thread()
+                
                 if self.settings['saving_type'] == 'Stack':
                     # measure is triggered by save_h5 button
                     self.camera.camera_device.stop_acquisition() 
                     self.measure()
                     break
+                
+                if self.settings['saving_type'] == 'Zarr':
+                    self.camera.camera_device.stop_acquisition() 
+                    self.measure_zarr()
+                    break
+                
+                if self.settings['saving_type'] == 'Burst':
+                    self.camera.camera_device.stop_acquisition() 
+                    self.measure_burst()
+                    break
+                
+                if self.settings['saving_type'] == 'TimeLapse':
+                    self.camera.camera_device.stop_acquisition() 
+                    self.measure_timelapse()
+                    break
         finally:
-            pass
+            self.camera.unpin_grab_thread()
          
     def create_saving_directory(self):
         
@@ -198,8 +628,7 @@ class IdsMeasure(Measurement):
             os.makedirs(self.app.settings['save_dir'])
         
     
-    def create_h5_file(self):                   
-        self.create_saving_directory()
+    def get_file_name(self, ext='.h5'):
         # file name creation
         timestamp = time.strftime("%y%m%d_%H%M%S", time.localtime())
         sample = self.app.settings['sample']
@@ -208,19 +637,36 @@ class IdsMeasure(Measurement):
             sample_name = '_'.join([timestamp, self.name])
         else:
             sample_name = '_'.join([timestamp, self.name, sample])
-        fname = os.path.join(self.app.settings['save_dir'], sample_name + '.h5')
+        return os.path.join(self.app.settings['save_dir'], sample_name + ext)
+    
+    def create_h5_file(self, length=None, frame_shape=None, dtype=None):
+        """
+        Creates the t0/c0/image dataset, by default for frame_num frames 
+        with the current ROI and bit depth of the camera
+        """
+        self.create_saving_directory()
+        fname = self.get_file_name('.h5')
         
         self.h5file = h5_io.h5_base_file(app=self.app, measurement=self, fname = fname)
         self.h5_group = h5_io.h5_create_measurement_group(measurement=self, h5group=self.h5file)
         
-        img_size = self.img.shape
-        dtype=self.img.dtype
+        # not from the last live frame: stop_acquisition may have applied queued ROI or bit depth changes
+        cam = self.camera.camera_device
+        img_size = frame_shape or (cam.get_height(), cam.get_width())
+        if dtype is None:
+            dtype = cam.get_frame_dtype()
         
-        length = self.frame_num.val
+        if length is None:
+            length = self.frame_num.val
         self.image_h5 = self.h5_group.create_dataset(name  = 't0/c0/image', 
                                                   shape = [length, img_size[0], img_size[1]],
                                                   dtype = dtype)
         self.image_h5.attrs['element_size_um'] =  [self.settings['zsampling'],self.settings['ysampling'],self.settings['xsampling']]
+        
+        self.thumbnail_writer = None
+        if self.settings['thumbnails']:
+            self.thumbnail_writer = ThumbnailWriter(self.h5_group, length, img_size, dtype)
+        self.last_fname = fname
                    
 
     
\ No newline at end of file
@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""
+Local frame broadcast through shared memory.
+
+FrameServer copies each published frame into a ring of slots in shared memory
+and notifies the subscribers, connected to a Unix socket, with the slot index and metadata.
+Subscribers use FrameClient to map the frames without copying them.
+Notifications are sent without blocking: a slow subscriber loses notifications
+(visible as gaps in seq) but never slows down the publisher.
+Configuration messages (a new ring after a change of frame shape or dtype) are never dropped:
+a subscriber too slow to receive one is disconnected, and sees a ConnectionError.
+
+    client = FrameClient()
+    frame, meta = client.get_frame()
+    ...  # use frame
+    if client.is_valid(meta): # the slot was not overwritten in the meantime
+        ...
+
+The ring starts with a header of (seq, frame_id, timestamp_ns) per slot, used as a seqlock:
+seq is set to -1 while the slot is being written.
+"""
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+from multiprocessing import shared_memory
+
+DEFAULT_ADDRESS = os.path.join(tempfile.gettempdir(), 'ids_frames.sock')
+HEADER_FIELDS = 3 # seq, frame_id, timestamp_ns
+ALIGNMENT = 64
+MAX_MESSAGE = 4096
+
+
+def _ring_layout(slots, shape, dtype):
+    header_bytes = slots * HEADER_FIELDS * 8
+    offset = (header_bytes + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+    size = offset + slots * int(np.prod(shape)) * np.dtype(dtype).itemsize
+    return offset, size
+
+
+def _map_ring(shm, slots, shape, dtype):
+    offset, _ = _ring_layout(slots, shape, dtype)
+    header = np.ndarray((slots, HEADER_FIELDS), dtype=np.int64, buffer=shm.buf)
+    frames = np.ndarray((slots, *shape), dtype=dtype, buffer=shm.buf, offset=offset)
+    return header, frames
+
+
+def _attach_shared_memory(name):
+    """ Attaches to an existing segment, without letting the resource tracker of
+    this process unlink it at exit"""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    except Exception:
+        pass
+    return shm
+
+
+class FrameServer:
+
+    def __init__(self, address=DEFAULT_ADDRESS, slots=16):
+        self.address = address
+        self.slots = slots
+        self.seq = 0
+        self.shm = None
+        self._config = None
+        self._subscribers = []
+        self._lock = threading.Lock() # subscribers and configuration
+        self._publish_lock = threading.Lock() # ring, shared by publish and close
+        if os.path.exists(address):
+            os.remove(address)
+        self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        self._listener.bind(address)
+        self._listener.listen()
+        self._running = True
+        self._accept_thread = threading.Thread(target=self._accept_loop, daemon=True)
+        self._accept_thread.start()
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                conn, _ = self._listener.accept()
+            except OSError:
+                break # listener closed
+            with self._lock:
+                if self._config is not None:
+                    conn.send(self._config) # blocking: the first message must arrive
+                conn.setblocking(False)
+                self._subscribers.append(conn)
+
+    def _allocate(self, shape, dtype):
+        """ (Re)creates the ring for frames of the given shape and dtype
+        and sends the new configuration to the subscribers"""
+        old = self.shm
+        _, size = _ring_layout(self.slots, shape, dtype)
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.header, self.frames = _map_ring(self.shm, self.slots, shape, dtype)
+        self.header[:] = -1
+        config = {'type': 'config', 'name': self.shm.name, 'slots': self.slots,
+                  'shape': list(shape), 'dtype': np.dtype(dtype).str}
+        with self._lock:
+            self._config = json.dumps(config).encode()
+            self._send_all(self._config, reliable=True)
+        if old is not None:
+            old.close()
+            old.unlink()
+
+    def _send_all(self, message, reliable=False):
+        """ Sends message to all the subscribers without blocking. 
+        If reliable (configuration messages), the subscribers whose queue is full are disconnected"""
+        for conn in list(self._subscribers):
+            try:
+                conn.send(message)
+            except BlockingIOError:
+                if reliable:
+                    # a subscriber that misses a configuration would keep reading the old ring
+                    self._subscribers.remove(conn)
+                    conn.close()
+                # otherwise slow subscriber: the notification is dropped
+            except OSError:
+                self._subscribers.remove(conn)
+                conn.close()
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def publish(self, img, frame_id=None, timestamp_ns=None):
+        """ Copies img in the next slot of the ring and notifies the subscribers.
+        Does nothing once the server is closed."""
+        with self._publish_lock:
+            if not self._running:
+                return
+            self._publish(img, frame_id, timestamp_ns)
+
+    def _publish(self, img, frame_id, timestamp_ns):
+        if self.shm is None or self.frames.shape[1:] != img.shape or self.frames.dtype != img.dtype:
+            self._allocate(img.shape, img.dtype)
+        seq = self.seq
+        slot = seq % self.slots
+        if frame_id is None:
+            frame_id = seq
+        if timestamp_ns is None:
+            timestamp_ns = time.time_ns()
+        header = self.header[slot]
+        header[0] = -1
+        np.copyto(self.frames[slot], img)
+        header[1] = frame_id
+        header[2] = timestamp_ns
+        header[0] = seq
+        message = f'{{"type":"frame","seq":{seq},"slot":{slot},"frame_id":{frame_id},"timestamp_ns":{timestamp_ns}}}'
+        with self._lock:
+            self._send_all(message.encode())
+        self.seq += 1
+
+    def close(self):
+        """ Stops the server. Waits for a publish in progress, since the ring is unmapped"""
+        with self._publish_lock:
+            self._running = False
+        self._listener.close()
+        with self._lock:
+            for conn in self._subscribers:
+                conn.close()
+            self._subscribers = []
+        if os.path.exists(self.address):
+            os.remove(self.address)
+        if self.shm is not None:
+            self.header = self.frames = None
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+
+class FrameClient:
+
+    def __init__(self, address=DEFAULT_ADDRESS):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        self.sock.connect(address)
+        self.shm = None
+        self.frames = None
+        self.header = None
+
+    def _configure(self, config):
+        self.close_ring()
+        try:
+            self.shm = _attach_shared_memory(config['name'])
+        except FileNotFoundError:
+            return # the ring was already replaced: a newer configuration follows
+        self.header, self.frames = _map_ring(self.shm, config['slots'],
+                                             tuple(config['shape']), np.dtype(config['dtype']))
+
+    def _receive(self, timeout):
+        """ Waits for the next frame notification, handling configuration messages"""
+        self.sock.settimeout(timeout)
+        while True:
+            data = self.sock.recv(MAX_MESSAGE)
+            if not data:
+                raise ConnectionError('Frame server closed')
+            message = json.loads(data)
+            if message['type'] == 'config':
+                self._configure(message)
+            elif self.frames is not None:
+                return message
+
+    def get_frame(self, timeout=None):
+        """ Returns (frame, meta) for the next notified frame.
+        frame is a view on the shared memory: it is valid until is_valid(meta) is False,
+        copy it to keep it."""
+        meta = self._receive(timeout)
+        return self.frames[meta['slot']], meta
+
+    def get_latest_frame(self, timeout=None):
+        """ Like get_frame, but skips the pending notifications and returns the newest frame"""
+        meta = self._receive(timeout)
+        try:
+            while True:
+                meta = self._receive(0)
+        except (BlockingIOError, socket.timeout):
+            pass
+        return self.frames[meta['slot']], meta
+
+    def is_valid(self, meta):
+        """ True if the slot of meta still holds the frame with seq meta['seq']"""
+        return int(self.header[meta['slot'], 0]) == meta['seq']
+
+    def close_ring(self):
+        if self.shm is not None:
+            self.header = self.frames = None
+            try:
+                self.shm.close()
+            except BufferError:
+                pass # frames still referenced by the caller: released when they are deleted
+            self.shm = None
+
+    def close(self):
+        self.close_ring()
+        self.sock.close()
@@ -2,6 +2,13 @@ from ids_peak import ids_peak
 from ids_peak import ids_peak_ipl_extension
 import warnings
 import numpy
+import threading
+import time
+import atexit
+import queue
+import os
+import sys
+import collections
 
 BitDepthChoices = {	8: "Mono8",
                     10: "Mono10",
@@ -9,21 +16,221 @@ BitDepthChoices = {	8: "Mono8",
                     16: "Mono16"
                    }
 
+LATENCY_SAMPLES = 10000 # latencies kept for the statistics
+TRIGGER_SAMPLES = 10000 # trigger times kept for the statistics
+CLOCK_SYNC_PERIOD = 5.0 # s between device/host clock synchronizations
+
+
+def pin_current_thread(cpu):
+    """ Restricts the calling thread to the given CPU core.
+    Returns the previous affinity, for restore_thread_affinity.
+    Threads started by the pinned thread inherit its affinity on Linux.
+    """
+    if sys.platform.startswith("linux"):
+        previous = os.sched_getaffinity(0) # 0 is the calling thread on Linux
+        os.sched_setaffinity(0, {cpu})
+        return previous
+    elif sys.platform == "win32":
+        return _set_thread_affinity_mask(1 << cpu)
+    else:
+        raise NotImplementedError(f"Thread pinning not supported on {sys.platform}")
+
+
+def restore_thread_affinity(previous):
+    """ Restores the affinity returned by pin_current_thread for the calling thread"""
+    if sys.platform.startswith("linux"):
+        os.sched_setaffinity(0, previous)
+    elif sys.platform == "win32":
+        _set_thread_affinity_mask(previous)
+
+
+def _set_thread_affinity_mask(mask):
+    import ctypes
+    kernel32 = ctypes.windll.kernel32
+    kernel32.GetCurrentThread.restype = ctypes.c_void_p
+    kernel32.SetThreadAffinityMask.argtypes = (ctypes.c_void_p, ctypes.c_size_t)
+    kernel32.SetThreadAffinityMask.restype = ctypes.c_size_t
+    return kernel32.SetThreadAffinityMask(kernel32.GetCurrentThread(), mask)
+
+
+# errors of the data stream after a transport fault (stall, lost link), recovered by recover_stream
+StreamErrors = tuple(getattr(ids_peak, name) for name in 
+                     ("TimeoutException", "AbortedException", "IOException", 
+                      "BadAccessException", "InternalErrorException", "NotAvailableException")
+                     if hasattr(ids_peak, name)) + (TimeoutError,)
+
+
+# settings that can be changed between frames while grabbing
+LiveChanges = ("exposure_ms", "gain", "frame_rate", "offsetx", "offsety")
+# settings that change the payload and need a restart of the acquisition
+RestartChanges = ("width", "height", "bit_depth")
+
+
+class IdsSession:
+    """
+    Process-wide, reference-counted IDS peak session.
+    The library is initialized once, the device enumeration is cached and 
+    opened devices (with their data stream) are kept in a pool, 
+    so that reconnecting to a camera does not rescan the bus or reopen the device.
+    The library is closed by shutdown, which runs at interpreter exit.
+    """
+    _lock = threading.RLock()
+    _refcount = 0
+    _descriptors = None
+    _pool = {} # serial number -> [device, data_stream, users]
+
+    @classmethod
+    def acquire(cls):
+        with cls._lock:
+            if cls._refcount == 0 and not cls._pool:
+                ids_peak.Library.Initialize()
+            cls._refcount += 1
+
+    @classmethod
+    def release(cls):
+        with cls._lock:
+            cls._refcount = max(0, cls._refcount - 1)
+            if cls._refcount == 0 and not cls._pool:
+                cls._close_library()
+
+    @classmethod
+    def devices(cls, update=False):
+        """ Returns the list of device descriptors, enumerating the devices only if needed"""
+        with cls._lock:
+            if cls._descriptors is None or update:
+                device_manager = ids_peak.DeviceManager.Instance()
+                device_manager.Update()
+                cls._descriptors = list(device_manager.Devices())
+            return cls._descriptors
+
+    @classmethod
+    def open_device(cls, cam_num=0, serial=None):
+        """ Returns (device, data_stream, serial) for the camera with the given serial number, 
+        or with index cam_num if serial is None. Reuses the pooled device if already open.
+        The devices are enumerated again if the camera is not in the cached list,
+        or if it cannot be opened (stale descriptor after the camera was plugged again).
+        """
+        with cls._lock:
+            descriptor, update = cls._find_descriptor(cam_num, serial)
+            serial = descriptor.SerialNumber()
+            if serial not in cls._pool:
+                try:
+                    device = descriptor.OpenDevice(ids_peak.DeviceAccessType_Control)
+                except Exception:
+                    if update:
+                        raise
+                    descriptor, _ = cls._find_descriptor(serial=serial, update=True)
+                    device = descriptor.OpenDevice(ids_peak.DeviceAccessType_Control)
+                data_stream = device.DataStreams()[0].OpenDataStream()
+                cls._pool[serial] = [device, data_stream, 0]
+            entry = cls._pool[serial]
+            entry[2] += 1
+            return entry[0], entry[1], serial
+
+    @classmethod
+    def _find_descriptor(cls, cam_num=0, serial=None, update=False):
+        """ Returns (descriptor, updated), enumerating the devices again if the camera is not listed"""
+        for update in ((True,) if update else (False, True)):
+            descriptors = cls.devices(update)
+            if serial is None:
+                if cam_num < len(descriptors):
+                    return descriptors[cam_num], update
+            else:
+                matching = [d for d in descriptors if d.SerialNumber() == str(serial)]
+                if matching:
+                    return matching[0], update
+        raise ValueError(f"IDS camera not found: index {cam_num}, serial {serial}")
+
+    @classmethod
+    def release_device(cls, serial, keep_open=False):
+        """ Releases a device opened with open_device. 
+        If keep_open is True, the device stays in the pool for a fast reconnect"""
+        with cls._lock:
+            entry = cls._pool.get(serial)
+            if entry is None:
+                return
+            entry[2] = max(0, entry[2] - 1)
+            if entry[2] == 0 and not keep_open:
+                del cls._pool[serial]
+                cls._close_device(entry[0])
+
+    @classmethod
+    def reopen_device(cls, serial):
+        """ Closes the pooled device and opens it again, rescanning the bus, after a transport fault. 
+        Returns (device, data_stream, serial); the users count of the device is kept"""
+        with cls._lock:
+            entry = cls._pool.pop(serial, None)
+            users = 1
+            if entry is not None:
+                users = max(1, entry[2])
+                cls._close_device(entry[0])
+            cls._descriptors = None
+            device, data_stream, serial = cls.open_device(serial=serial)
+            cls._pool[serial][2] = users
+            return device, data_stream, serial
+
+    @classmethod
+    def shutdown(cls):
+        """ Closes all the pooled devices and the library"""
+        with cls._lock:
+            for device, _, _ in cls._pool.values():
+                cls._close_device(device)
+            cls._pool.clear()
+            cls._refcount = 0
+            cls._close_library()
+
+    @staticmethod
+    def _close_device(device):
+        try:
+            device.Close()
+        except Exception:
+            pass
+
+    @classmethod
+    def _close_library(cls):
+        cls._descriptors = None
+        try:
+            ids_peak.Library.Close()
+        except Exception:
+            pass
+
+
+atexit.register(IdsSession.shutdown)
+
 
 class Camera:
+
+    stream_errors = StreamErrors
     
-    def __init__(self, cam_num=0, debug=False):
-        ids_peak.Library.Initialize()
-        device_manager = ids_peak.DeviceManager.Instance()
-        device_manager.Update()
-        self.device = device_manager.Devices()[cam_num].OpenDevice(ids_peak.DeviceAccessType_Control)
+    def __init__(self, cam_num=0, debug=False, serial=None, keep_open=False):
+        IdsSession.acquire()
+        try:
+            self.device, self.data_stream, self.serial = IdsSession.open_device(cam_num, serial)
+        except Exception:
+            IdsSession.release()
+            raise
+        self.keep_open = keep_open
         # Nodemap for accessing GenICam nodes
         self.remote_nodemap = self.device.RemoteDevice().NodeMaps()[0]
-        self.data_stream = self.device.DataStreams()[0].OpenDataStream()
         self.debug = debug
         self.trigger_task = None
+        self._commands = queue.Queue()
+        self._change_lock = threading.RLock()
+        self._grab_thread = None
+        self.change_log = []
+        self.frames_delivered = 0
+        self._buffer_count = 0
+        self._block = None
+        self.low_latency = False
+        self._held_buffer = None
+        self._latencies = numpy.zeros(LATENCY_SAMPLES)
+        self._latency_count = 0
+        self._clock_offset_ns = None
+        self._clock_sync_time = 0
         self._last_delay = 0.1
         self._current_frame_rate = 0
+        self._config = None
+        self._frame_target = None
 
     def set_debug_mode(self, value):
         self.debug = value
@@ -34,6 +241,9 @@ class Camera:
     def get_model(self):
         return self.device.ModelName()
 
+    def get_serial(self):
+        return self.serial
+
     def get_width(self):
         val = self.remote_nodemap.FindNode("Width").Value()
         if self.debug:
@@ -154,6 +364,13 @@ class Camera:
                 self.remote_nodemap.FindNode("AcquisitionFrameRate").Maximum())
         if self.debug: self.get_exposure_ms()
 
+    def get_max_exposure_ms(self):
+        """ Maximum exposure time available at the current frame rate"""
+        return self.remote_nodemap.FindNode("ExposureTime").Maximum()/1000
+
+    def get_max_gain(self):
+        return self.remote_nodemap.FindNode("Gain").Maximum()
+
     def set_gain(self,value):
         self.set_node_value("Gain",value)
 
@@ -264,54 +481,289 @@ class Camera:
         return grabbing, delivered, lost, in_cnt, out_cnt, frame_id
         
 
-    def start_acquisition(self, buffersize=16):
+    def start_acquisition(self, buffersize=16, live=False):
+        """ Announces the buffers and starts the acquisition.
+        If live is True (live view, closed loop) and the low-latency mode is on, 
+        the minimal buffer pool is used instead of buffersize.
+        """
+        self._prepare_acquisition(buffersize, minimal_pool = live and self.low_latency)
+        self._start_stream()
+        if self.low_latency:
+            try:
+                self.sync_clock()
+            except Exception:
+                pass # timestamp latch not supported: the latency is not measured
 
+    def _prepare_acquisition(self, buffersize, minimal_pool=False):
+        """ Resets the counters and announces the buffer pool"""
         if self.debug:
             value = self.data_stream.NodeMaps()[0].FindNode("StreamBufferHandlingMode").CurrentEntry().SymbolicValue()
             print("StreamBufferHandlingMode",value)
-        nm = self.remote_nodemap
-        payload_size = nm.FindNode("PayloadSize").Value()
         min_req = self.data_stream.NumBuffersAnnouncedMinRequired()
 
         base = max(min_req, int(buffersize))
         buffer_count_max = base + int(base*0.1) # buffer increased by 10%
-
-        for _ in range(buffer_count_max):
+        if minimal_pool:
+            # one buffer being filled, one ready and one held by get_frame_nocopy
+            buffer_count_max = max(min_req, 3)
+
+        self.frames_delivered = 0
+        self._frames_at_start = 0
+        self.change_log = []
+        self._config = self.get_config() # restored by recover_stream
+        self._frame_target = self._config["frame_count"] if self._config["acquisition_mode"] == "MultiFrame" else None
+        self._announce_buffers(buffer_count_max)
+
+    def _announce_buffers(self, count):
+        payload_size = self.remote_nodemap.FindNode("PayloadSize").Value()
+        for _ in range(count):
             buf = self.data_stream.AllocAndAnnounceBuffer(payload_size)
             self.data_stream.QueueBuffer(buf)
+        self._buffer_count = count
 
+    def _start_stream(self):
+        nm = self.remote_nodemap
         self.data_stream.StartAcquisition()
         nm.FindNode("AcquisitionStart").Execute()
         nm.FindNode("AcquisitionStart").WaitUntilDone()
 
+    def is_grabbing(self):
+        return self.data_stream.NodeMaps()[0].FindNode("StreamIsGrabbing").Value()
+
+    def _change_setter(self, name):
+        setters = {"exposure_ms": self.set_exposure_ms,
+                   "gain": self.set_gain,
+                   "frame_rate": self.set_frame_rate,
+                   # while grabbing, offsets are set directly: set_active_region also writes Width and Height
+                   "offsetx": lambda x: self.set_node_value("OffsetX", x),
+                   "offsety": lambda y: self.set_node_value("OffsetY", y),
+                   "width": self.set_width,
+                   "height": self.set_height,
+                   "bit_depth": self.set_bit_depth}
+        return setters[name]
+
+    def queue_change(self, name, value, wait_s=0.2):
+        """ Changes a setting (one of LiveChanges or RestartChanges) without stopping the acquisition.
+        If the camera is not grabbing the change is applied immediately. 
+        Otherwise it is queued and applied by the grabbing thread before the next frame:
+        LiveChanges are written between frames, RestartChanges restart the acquisition 
+        keeping the buffers count. Waits up to wait_s for the change to be applied, 
+        and returns False if it was not applied yet (e.g. the grabbing thread waits for a trigger).
+        Changes still queued when the acquisition stops are applied by stop_acquisition.
+        Applied changes are listed in change_log as (frame_index, name, value), where frame_index 
+        is the first frame (counted from start_acquisition) that can carry the change.
+        """
+        if name not in LiveChanges + RestartChanges:
+            raise ValueError(f"Unknown setting: {name}")
+        with self._change_lock: # stop_acquisition cannot leave the change in the queue
+            if not self.is_grabbing():
+                self._change_setter(name)(value)
+                return True
+            done = threading.Event()
+            self._commands.put((name, value, done))
+        if threading.get_ident() == self._grab_thread:
+            self._apply_changes() # called between frames by the grabbing thread itself
+        elif not done.wait(wait_s):
+            print(f"{name} change to {value} queued: it will be applied before the next frame")
+            return False
+        return True
+
+    def _apply_changes(self):
+        with self._change_lock:
+            self._apply_queued_changes()
+
+    def _apply_queued_changes(self):
+        while not self._commands.empty():
+            name, value, done = self._commands.get_nowait()
+            try:
+                if name in RestartChanges:
+                    self._restart_with(self._change_setter(name), value)
+                    frame_index = self.frames_delivered
+                else:
+                    self._change_setter(name)(value)
+                    # frames already waiting in the output queue were exposed before the change
+                    out_cnt = self.read_node_safely(self.data_stream.NodeMaps()[0], "StreamOutputBufferCount") or 0
+                    frame_index = self.frames_delivered + out_cnt
+                self.change_log.append((frame_index, name, value))
+                if self._config is not None:
+                    self._config[name] = value # restored by recover_stream
+                if name == "exposure_ms":
+                    self._clock_offset_ns = None # resynchronize, reading the new exposure time
+                if self.debug:
+                    print(f"{name} set to {value} from frame {frame_index}")
+            except Exception as e:
+                print(f"Cannot change {name} to {value}: {e}")
+            finally:
+                done.set()
+
+    def _restart_with(self, setter, value):
+        """ Stops the acquisition, applies setter(value), reallocates the buffers 
+        for the new payload and restarts, continuing a MultiFrame acquisition"""
+        nm = self.remote_nodemap
+        nm.FindNode("AcquisitionStop").Execute()
+        nm.FindNode("AcquisitionStop").WaitUntilDone()
+        self.data_stream.StopAcquisition(ids_peak.AcquisitionStopMode_Default)
+        self.data_stream.Flush(ids_peak.DataStreamFlushMode_DiscardAll)
+        for buffer in self.data_stream.AnnouncedBuffers():
+            self.data_stream.RevokeBuffer(buffer)
+        setter(value)
+        if self.get_acquisition_mode() == "MultiFrame":
+            count = nm.FindNode("AcquisitionFrameCount").Value()
+            delivered = self.frames_delivered - self._frames_at_start
+            nm.FindNode("AcquisitionFrameCount").SetValue(max(1, count - delivered))
+        self._frames_at_start = self.frames_delivered
+        self._announce_buffers(self._buffer_count)
+        self._start_stream()
 
-    def stop_acquisition(self):
 
-        if self.data_stream.NodeMaps()[0].FindNode("StreamIsGrabbing").Value():
-            self.remote_nodemap.FindNode("AcquisitionStop").Execute()
-            self.remote_nodemap.FindNode("AcquisitionStop").WaitUntilDone()
+    def stop_acquisition(self):
+        """ Stops the acquisition and revokes the buffers. 
+        Each step is attempted even if the previous ones fail, so that a stream 
+        left in a faulty state by a link error is cleaned up"""
+        self._held_buffer = None
 
-            self.data_stream.StopAcquisition(ids_peak.AcquisitionStopMode_Default)
-            self.data_stream.Flush(ids_peak.DataStreamFlushMode_DiscardAll)
+        grabbing = self.read_node_safely(self.data_stream.NodeMaps()[0], "StreamIsGrabbing")
+        if grabbing or grabbing is None:
+            try:
+                self.remote_nodemap.FindNode("AcquisitionStop").Execute()
+                self.remote_nodemap.FindNode("AcquisitionStop").WaitUntilDone()
+            except Exception as e:
+                print(f"AcquisitionStop failed: {e}")
+            try:
+                self.data_stream.StopAcquisition(ids_peak.AcquisitionStopMode_Default)
+            except Exception as e:
+                if grabbing: print(f"Data stream stop failed: {e}")
+            try:
+                self.data_stream.Flush(ids_peak.DataStreamFlushMode_DiscardAll)
+            except Exception as e:
+                if grabbing: print(f"Data stream flush failed: {e}")
         else: 
             if self.debug: print("Data stream not running")
         
-        for buffer in self.data_stream.AnnouncedBuffers():
-            self.data_stream.RevokeBuffer(buffer)
-
-    def get_frame(self, timeout_ms=1000):
+        try:
+            for buffer in self.data_stream.AnnouncedBuffers():
+                self.data_stream.RevokeBuffer(buffer)
+        except Exception as e:
+            print(f"Cannot revoke the buffers: {e}")
+        self._apply_stopped_changes()
+
+    def _apply_stopped_changes(self):
+        """ Applies the changes still queued when the acquisition stopped, 
+        so that they are not carried over to the next acquisition"""
+        with self._change_lock:
+            while not self._commands.empty():
+                name, value, done = self._commands.get_nowait()
+                try:
+                    self._change_setter(name)(value)
+                    if self.debug:
+                        print(f"{name} set to {value} after the acquisition stopped")
+                except Exception as e:
+                    print(f"Cannot change {name} to {value}: {e}")
+                finally:
+                    done.set()
+
+    def get_config(self):
+        """ Returns the acquisition settings, as a dict that set_config restores"""
+        nm = self.remote_nodemap
+        return {"bit_depth": self.get_bit_depth(),
+                "offsetx": self.get_offsetx(),
+                "offsety": self.get_offsety(),
+                "width": self.get_width(),
+                "height": self.get_height(),
+                "frame_rate": self.get_frame_rate(),
+                "exposure_ms": self.get_exposure_ms(),
+                "gain": self.get_gain(),
+                "acquisition_mode": self.get_acquisition_mode(),
+                "frame_count": self.read_node_safely(nm, "AcquisitionFrameCount") or 1,
+                "stream_mode": self.get_stream_mode(),
+                "trigger_source": self.get_trigger_source(),
+                "trigger_delay": self._last_delay,
+                }
+
+    def set_config(self, config):
+        """ Applies the settings returned by get_config"""
+        self.set_bit_depth(config["bit_depth"])
+        self.set_active_region(config["offsetx"], config["offsety"], config["width"], config["height"])
+        # exposure and frame rate limit each other: the frame rate is set again after the exposure
+        self.set_frame_rate(config["frame_rate"])
+        self.set_exposure_ms(config["exposure_ms"])
+        self.set_frame_rate(config["frame_rate"])
+        self.set_gain(config["gain"])
+        self.set_acquisition_mode(config["acquisition_mode"])
+        if config["acquisition_mode"] == "MultiFrame":
+            self.set_frame_num(config["frame_count"])
+        self.set_stream_mode(config["stream_mode"])
+        self.set_trigger_delay(config["trigger_delay"])
+        self.set_trigger_source(config["trigger_source"])
+
+    def get_lost_frame_count(self):
+        return self.read_node_safely(self.data_stream.NodeMaps()[0], "StreamLostFrameCount") or 0
+
+    def recover_stream(self, reopen=False):
+        """ Restarts the acquisition after a transport fault (stalled stream, lost link), 
+        with the same buffer pool size and configuration of the last start_acquisition.
+        A MultiFrame acquisition continues with the frames still missing.
+        If the stream cannot be restarted, or reopen is True, the device is closed and opened again
+        and the configuration is restored.
+        Returns True if the device was reopened.
+        """
+        remaining = None
+        if self._frame_target is not None:
+            remaining = self._frame_target - self.frames_delivered
+            if remaining <= 0:
+                return False # the fault came after the last frame
+        self.stop_acquisition()
+        if not reopen:
+            try:
+                self._restart_stream(remaining)
+                return False
+            except Exception as e:
+                print(f"Cannot restart the data stream ({e}): reopening the device")
+                self.stop_acquisition()
+        self.device, self.data_stream, self.serial = IdsSession.reopen_device(self.serial)
+        self.remote_nodemap = self.device.RemoteDevice().NodeMaps()[0]
+        self.set_config(self._config)
+        self._restart_stream(remaining)
+        return True
+
+    def _restart_stream(self, remaining):
+        if remaining is not None:
+            self.remote_nodemap.FindNode("AcquisitionFrameCount").SetValue(int(remaining))
+        self._frames_at_start = self.frames_delivered
+        self._announce_buffers(self._buffer_count)
+        self._start_stream()
+
+    def get_frame_dtype(self):
+        """ Returns the numpy dtype of the frames delivered with the current PixelFormat"""
+        if self.get_bit_depth() == 8:
+            return numpy.uint8
+        return numpy.uint16
+
+    def get_frame(self, timeout_ms=1000, out=None):
         """Gets frame from camera. 
         Use set_stream_mode with values:
         'NewestOnly', 'OldestFirst', 'OldestFirstSingleBuffer','OldestFirstDependOnCameraFIFO'
         to change the streming buffer handling mode.
+        If out is a preallocated (height, width) array, the frame is copied into it 
+        and out is returned, avoiding a new allocation per frame.
         """
 
+        self._grab_thread = threading.get_ident()
+        if not self._commands.empty():
+            self._apply_changes()
         buffer = self.data_stream.WaitForFinishedBuffer(timeout_ms)
+        self.frames_delivered += 1
         if self.debug:
             self.frame_id = buffer.FrameID()
 
         ids_image=ids_peak_ipl_extension.BufferToImage(buffer)
-        img = numpy.copy(ids_image.get_numpy())
+        if out is None:
+            img = numpy.copy(ids_image.get_numpy())
+        else:
+            numpy.copyto(out, ids_image.get_numpy())
+            img = out
+        if self.low_latency:
+            self._record_latency(buffer)
         try:
             self.data_stream.QueueBuffer(buffer)
         except Exception as e:
@@ -320,6 +772,134 @@ class Camera:
         return img
                 
 
+    def set_low_latency(self, enable):
+        """ Low-latency mode, for closed-loop use: the stream delivers the newest frame only,
+        live acquisitions (start_acquisition with live=True) use the minimal number of buffers 
+        and the latency between the end of the exposure and the frame available in Python is measured.
+        Takes effect at the next start_acquisition.
+        """
+        self.low_latency = bool(enable)
+        if self.low_latency:
+            self.set_stream_mode("NewestOnly")
+
+    def get_low_latency(self):
+        return self.low_latency
+
+    def get_frame_nocopy(self, timeout_ms=1000):
+        """Gets the newest frame as a view on the camera buffer, without copying it.
+        The view is valid until the next call of get_frame_nocopy or stop_acquisition,
+        when the buffer is given back to the camera.
+        """
+        self._grab_thread = threading.get_ident()
+        if self._held_buffer is not None:
+            self.data_stream.QueueBuffer(self._held_buffer)
+            self._held_buffer = None
+        if not self._commands.empty():
+            self._apply_changes()
+        buffer = self.data_stream.WaitForFinishedBuffer(timeout_ms)
+        self.frames_delivered += 1
+        self._held_buffer = buffer
+        img = ids_peak_ipl_extension.BufferToImage(buffer).get_numpy()
+        if self.low_latency:
+            self._record_latency(buffer)
+        return img
+
+    def sync_clock(self):
+        """ Measures the offset between the device timestamps and the host perf_counter_ns clock, 
+        latching the device time halfway through the host measurement"""
+        nm = self.remote_nodemap
+        t0 = time.perf_counter_ns()
+        nm.FindNode("TimestampLatch").Execute()
+        t1 = time.perf_counter_ns()
+        device_ns = nm.FindNode("TimestampLatchValue").Value()
+        self._clock_offset_ns = (t0 + t1)//2 - device_ns
+        self._clock_sync_time = time.perf_counter()
+        self._exposure_ns = int(self.remote_nodemap.FindNode("ExposureTime").Value()*1000)
+
+    def _record_latency(self, buffer):
+        t_host = time.perf_counter_ns()
+        if self._clock_offset_ns is None or time.perf_counter() - self._clock_sync_time > CLOCK_SYNC_PERIOD:
+            try:
+                self.sync_clock()
+            except Exception:
+                return # timestamp latch not supported
+        # buffer timestamps mark the start of the exposure
+        exposure_end = buffer.Timestamp_ns() + self._exposure_ns + self._clock_offset_ns
+        self._latencies[self._latency_count % LATENCY_SAMPLES] = (t_host - exposure_end) / 1e6
+        self._latency_count += 1
+
+    def reset_latency(self):
+        self._latency_count = 0
+
+    def get_latencies_ms(self):
+        """ Returns the last measured latencies (ms), from the end of the exposure to the frame in Python"""
+        return self._latencies[:min(self._latency_count, LATENCY_SAMPLES)].copy()
+
+    def get_latency_stats(self):
+        """ Returns a dict with the number of samples and mean, median, 99th percentile and maximum latency in ms"""
+        latencies = self.get_latencies_ms()
+        if len(latencies) == 0:
+            return {"count": 0, "mean": 0., "p50": 0., "p99": 0., "max": 0.}
+        p50, p99 = numpy.percentile(latencies, [50, 99])
+        stats = {"count": len(latencies), "mean": latencies.mean(), "p50": p50, "p99": p99, "max": latencies.max()}
+        if self.debug:
+            print(f"Latency (ms): {stats}")
+        return stats
+
+    def get_latency_histogram(self, bins=50):
+        """ Returns (counts, bin_edges) of the latencies in ms"""
+        return numpy.histogram(self.get_latencies_ms(), bins=bins)
+
+    def get_frames(self, n, out=None, timeout_ms=1000):
+        """Gets up to n frames in one call, copying them in a (n, height, width) block.
+        Waits up to timeout_ms for each frame; if a wait times out after at least
+        one frame, the frames received so far are returned, otherwise the timeout is raised.
+        
+        Args:
+            out: caller-supplied block. If None, a block owned by the camera is reused, 
+                 which is overwritten by the next get_frames call.
+        Returns:
+            frames, frame_ids, timestamps_ns: views of the block and arrays of the received frames
+        """
+        self._grab_thread = threading.get_ident()
+        if not self._commands.empty():
+            self._apply_changes() # before sizing the block: the change may alter the frame shape
+        if out is None:
+            shape = (n, self.get_height(), self.get_width())
+            dtype = self.get_frame_dtype()
+            if self._block is None or self._block.shape[0] < n or self._block.shape[1:] != shape[1:] or self._block.dtype != dtype:
+                self._block = numpy.empty(shape, dtype=dtype)
+            out = self._block
+        n = min(n, len(out))
+        frame_ids = numpy.empty(n, dtype=numpy.int64)
+        timestamps = numpy.empty(n, dtype=numpy.int64)
+
+        wait_for_buffer = self.data_stream.WaitForFinishedBuffer
+        queue_buffer = self.data_stream.QueueBuffer
+        buffer_to_image = ids_peak_ipl_extension.BufferToImage
+        count = 0
+        while count < n:
+            try:
+                buffer = wait_for_buffer(timeout_ms)
+            except Exception:
+                if count == 0:
+                    raise
+                break
+            try:
+                frame_ids[count] = buffer.FrameID()
+                timestamps[count] = buffer.Timestamp_ns()
+                img = buffer_to_image(buffer).get_numpy()
+                if img.shape != out.shape[1:] or img.dtype != out.dtype:
+                    # copyto would cast uint16 frames into a uint8 block silently
+                    raise ValueError(f"Frame {img.shape} {img.dtype} does not fit the block {out.shape[1:]} {out.dtype}")
+                numpy.copyto(out[count], img)
+            finally:
+                queue_buffer(buffer) # the buffer goes back to the camera also if the copy fails
+            count += 1
+        self.frames_delivered += count
+        self.frame_id = frame_ids[count-1]
+        return out[:count], frame_ids[:count], timestamps[:count]
+
     def set_external_trigger(self, line="Line0", activation="RisingEdge", exposure_mode="Timed"):
         nm = self.remote_nodemap
 
@@ -339,7 +919,7 @@ class Camera:
             pass
 
         try:
-            nm.FindNode("TriggerDelay").SetValue(0)
+            nm.FindNode("TriggerDelay").SetValue(self._last_delay*1000)
         except Exception:
             pass
 
@@ -380,6 +960,9 @@ class Camera:
         node = nm.FindNode("TriggerMode")
         self._set_enum_node(node, "Off")
 
+    def enable_software_trigger(self):
+        self.set_external_trigger(line="Software")
+
     def set_trigger_source(self, source):
         source = str(source)
         if source == "Internal":
@@ -388,6 +971,9 @@ class Camera:
         if source == "External":
             self.enable_trigger()
             return
+        if source == "Software":
+            self.enable_software_trigger()
+            return
         raise ValueError(f"Unknown trigger source: {source}")
 
 
@@ -395,33 +981,192 @@ class Camera:
         nm = self.remote_nodemap
         try:
             mode = nm.FindNode("TriggerMode").CurrentEntry().SymbolicValue()
-            return "External" if mode == "On" else "Internal"
+            if mode != "On":
+                return "Internal"
+            line = nm.FindNode("TriggerSource").CurrentEntry().SymbolicValue()
+            return "Software" if line == "Software" else "External"
         except Exception:
             return "Internal"
 
+    def set_trigger_delay(self, delay_ms):
+        """ Sets the delay between the trigger and the exposure start, in ms"""
+        self._last_delay = delay_ms
+        self.set_node_value("TriggerDelay", delay_ms*1000)
 
-    def close(self):
+    def get_trigger_delay(self):
         try:
-            self.stop_acquisition()
+            val = self.remote_nodemap.FindNode("TriggerDelay").Value()/1000
         except Exception:
-            pass
+            val = self._last_delay
+        if self.debug:
+            print(f"TriggerDelay: {val} ms")
+        return val
+
+    def trigger_software(self):
+        """ Issues a single software trigger. The trigger source must be set to Software"""
+        self.remote_nodemap.FindNode("TriggerSoftware").Execute()
+
+    def set_line_output(self, line="Line1", source="ExposureActive"):
+        """ Configures an IO line as output driven by source 
+        (e.g. 'ExposureActive', 'Off', 'UserOutput0').
+        Use source='Off' to release the line.
+        """
+        nm = self.remote_nodemap
+        nm.FindNode("LineSelector").SetCurrentEntry(line)
         try:
-            self.device.Close()
+            nm.FindNode("LineMode").SetCurrentEntry("Output")
         except Exception:
-            pass
+            pass # output-only lines have a read-only LineMode
+        self._set_enum_node(nm.FindNode("LineSource"), source)
 
-        if hasattr(self, "_stop_trigger_task"):
-            try:
-                self._stop_trigger_task()
-            except Exception:
-                pass
+    def get_line_output(self, line="Line1"):
+        nm = self.remote_nodemap
+        try:
+            nm.FindNode("LineSelector").SetCurrentEntry(line)
+            return nm.FindNode("LineSource").CurrentEntry().SymbolicValue()
+        except Exception:
+            return "Off"
+
+    def start_trigger_task(self, rate, count=None, spin_s=0.002, on_done=None):
+        """ Starts a thread that issues software triggers at the target rate (Hz).
+        Issues count triggers, or runs until _stop_trigger_task is called if count is None.
+        The thread sleeps until spin_s before each deadline and busy-waits the rest,
+        yielding the GIL, to keep the jitter low. Timing statistics are given by get_trigger_stats,
+        on the last TRIGGER_SAMPLES triggers. on_done() is called by the thread when it ends.
+        A failed trigger stops the task and is kept in trigger_error.
+        """
+        self._stop_trigger_task()
+        self.trigger_times = collections.deque(maxlen=TRIGGER_SAMPLES)
+        self.trigger_issued = 0
+        self.trigger_error = None
+        self._trigger_period = 1/rate
+        self._trigger_stop = threading.Event()
+        self.trigger_task = threading.Thread(target=self._trigger_loop,
+                                             args=(self._trigger_period, count, spin_s, on_done),
+                                             daemon=True)
+        self.trigger_task.start()
+
+    def _trigger_loop(self, period, count, spin_s, on_done):
+        node = self.remote_nodemap.FindNode("TriggerSoftware")
+        t_next = time.perf_counter()
+        try:
+            while not self._trigger_stop.is_set() and (count is None or self.trigger_issued < count):
+                remaining = t_next - time.perf_counter()
+                if remaining > spin_s:
+                    self._trigger_stop.wait(remaining - spin_s)
+                while time.perf_counter() < t_next:
+                    time.sleep(0) # yields the GIL: a bare spin would stall the grabbing thread
+                t = time.perf_counter()
+                try:
+                    node.Execute()
+                except Exception as e:
+                    self.trigger_error = e
+                    print(f"Software trigger {self.trigger_issued} failed, trigger task stopped: {e}")
+                    break
+                self.trigger_times.append(t)
+                self.trigger_issued += 1
+                t_next += period
+                if t_next < time.perf_counter(): 
+                    # overrun: skip the missed deadlines to keep the schedule phase
+                    missed = int((time.perf_counter() - t_next) / period) + 1
+                    t_next += missed * period
+        finally:
+            if on_done is not None:
+                on_done()
+
+    def arm_bursts(self, frames, mode="MultiFrame"):
+        """ Prepares repeated bursts of frames, as the time points of a time-lapse.
+        The buffer pool is announced and the data stream started once; 
+        each burst is started by fire_burst and read with get_frames, then end_burst 
+        re-arms the camera for the next one. disarm_bursts restores the acquisition mode and trigger source.
 
+        Args:
+            frames (int): frames per burst
+            mode (str): 'MultiFrame' starts each burst with one AcquisitionStart, 
+                        'Software' keeps the acquisition running and triggers each frame
+        """
+        self.stop_acquisition()
+        self._trigger_before_bursts = self.get_trigger_source()
+        if mode == "MultiFrame":
+            self.disable_trigger()
+            self.set_frame_num(frames)
+        elif mode == "Software":
+            self.set_acquisition_mode("Continuous")
+            self.enable_software_trigger()
+        else:
+            raise ValueError(f"Unknown burst mode: {mode}")
+        self.set_stream_mode("OldestFirst")
+        self._burst_mode = mode
+        self._burst_frames = int(frames)
+        self._prepare_acquisition(frames)
+        self._frame_target = None # bursts are not recovered by recover_stream
+        if mode == "MultiFrame":
+            self.data_stream.StartAcquisition() # the device is started by fire_burst
+        else:
+            self._start_stream() # the device waits for the triggers
+
+    def fire_burst(self):
+        """ Starts a burst prepared by arm_bursts"""
+        if self._burst_mode == "MultiFrame":
+            self.remote_nodemap.FindNode("AcquisitionStart").Execute()
+        elif self._burst_frames == 1:
+            self.trigger_software()
+        else:
+            self.start_trigger_task(self.get_frame_rate(), self._burst_frames)
+
+    def end_burst(self):
+        """ Re-arms the camera after the frames of a burst have been read"""
+        if self._burst_mode == "MultiFrame":
+            self.remote_nodemap.FindNode("AcquisitionStop").Execute()
+            self.remote_nodemap.FindNode("AcquisitionStop").WaitUntilDone()
+        else:
+            self._stop_trigger_task()
+
+    def disarm_bursts(self):
+        self._stop_trigger_task()
+        self.stop_acquisition()
+        self.set_acquisition_mode("Continuous")
+        self.set_trigger_source(self._trigger_before_bursts)
+
+    def _stop_trigger_task(self):
+        if self.trigger_task is not None:
+            self._trigger_stop.set()
+            self.trigger_task.join()
+            self.trigger_task = None
+
+    def get_trigger_stats(self):
+        """ Returns a dict with the timing statistics of the last paced trigger task:
+        number of triggers, achieved rate (Hz), mean period, period jitter (std) 
+        and maximum deviation from the ideal schedule, in ms.
+        The timings are computed on the last TRIGGER_SAMPLES triggers.
+        """
+        times = numpy.array(list(getattr(self, "trigger_times", [])))
+        stats = {"count": getattr(self, "trigger_issued", 0), "rate": 0., "period_ms": 0., 
+                 "jitter_ms": 0., "max_error_ms": 0.}
+        if len(times) < 2:
+            return stats
+        periods = numpy.diff(times)
+        ideal = numpy.round((times - times[0]) / self._trigger_period) * self._trigger_period
+        stats["rate"] = (len(times) - 1) / (times[-1] - times[0])
+        stats["period_ms"] = periods.mean() * 1000
+        stats["jitter_ms"] = periods.std() * 1000
+        stats["max_error_ms"] = numpy.abs(times - times[0] - ideal).max() * 1000
+        if self.debug:
+            print(f"Software trigger stats: {stats}")
+        return stats
 
-        try:
-            ids_peak.Library.Close()
 
+    def close(self):
+        try:
+            self._stop_trigger_task()
+        except Exception:
+            pass
+        try:
+            self.stop_acquisition()
         except Exception:
             pass
+        IdsSession.release_device(self.serial, self.keep_open)
+        IdsSession.release()
 
 
 if __name__=="__main__":
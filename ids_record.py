@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Headless recorder for IDS cameras.
+Loads a ScopeFoundry settings/*.ini profile, records a number of frames or a duration
+and saves them with the same HDF5 layout as IdsMeasure.create_h5_file, without Qt or the GUI.
+
+    python ids_record.py settings/high_frame_rate.ini --frames 1000
+    python ids_record.py settings/settings.ini --duration 10 --save-dir D:/data
+
+Heavy modules (h5py, the IDS peak library) are imported only when needed,
+h5py after the first frame has been acquired.
+"""
+import time
+t_start = time.perf_counter()
+
+import argparse
+import configparser
+import os
+
+HW_SECTION = 'hw/IDS'
+MEASURE_NAME = 'IDSmeasurement'
+MEASURE_SECTION = 'mm/' + MEASURE_NAME
+
+
+def parse_value(text):
+    """ Converts an ini string to bool, int or float when possible"""
+    if text in ('True', 'False'):
+        return text == 'True'
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return text
+
+
+def load_profile(fname):
+    config = configparser.ConfigParser(interpolation=None)
+    config.optionxform = str # keep the case of the setting names
+    if not config.read(fname):
+        raise FileNotFoundError(fname)
+    return {section: {key: parse_value(val) for key, val in config[section].items()}
+            for section in config.sections()}
+
+
+def configure_camera(cam, hw_settings):
+    """ Applies the hw/IDS settings to the camera, in the order of the ini file"""
+    setters = {'debug_mode': cam.set_debug_mode,
+               'image_width': cam.set_width,
+               'image_height': cam.set_height,
+               'image_offsetx': cam.set_offsetx,
+               'image_offsety': cam.set_offsety,
+               'bit_depth': cam.set_bit_depth,
+               'gain': cam.set_gain,
+               'frame_rate': cam.set_frame_rate,
+               'exposure_time': cam.set_exposure_ms,
+               'trigger_source': cam.set_trigger_source,
+               'trigger_delay': cam.set_trigger_delay,
+               }
+    for key, value in hw_settings.items():
+        if key in setters:
+            setters[key](value)
+
+
+def read_camera_settings(cam):
+    return {'model': cam.get_model(),
+            'serial_number': cam.get_serial(),
+            'image_width': cam.get_width(),
+            'image_height': cam.get_height(),
+            'image_offsetx': cam.get_offsetx(),
+            'image_offsety': cam.get_offsety(),
+            'bit_depth': cam.get_bit_depth(),
+            'gain': cam.get_gain(),
+            'frame_rate': cam.get_frame_rate(),
+            'exposure_time': cam.get_exposure_ms(),
+            'trigger_source': cam.get_trigger_source(),
+            }
+
+
+def create_h5_file(fname, profile, hw_settings, measure_settings, frame_shape, dtype, length):
+    """
+    Creates the file with the layout of ScopeFoundry h5_io and IdsMeasure.create_h5_file.
+    If length is None the image dataset is extendable along the first axis.
+    """
+    import h5py
+    h5file = h5py.File(fname, 'w')
+    h5file.attrs['time_id'] = int(time.time())
+    app_group = h5file.create_group('app')
+    app_group.attrs['name'] = 'camera_app'
+    app_group.attrs['ScopeFoundry_type'] = 'App'
+    save_attrs(app_group.create_group('settings'), profile.get('app', {}))
+
+    hw_list = h5file.create_group('hardware')
+    hw_list.attrs['ScopeFoundry_type'] = 'HardwareList'
+    hw_group = hw_list.create_group('IDS')
+    hw_group.attrs['name'] = 'IDS'
+    hw_group.attrs['ScopeFoundry_type'] = 'Hardware'
+    save_attrs(hw_group.create_group('settings'), hw_settings)
+
+    h5_group = h5file.create_group('measurement/' + MEASURE_NAME)
+    h5_group.attrs['name'] = MEASURE_NAME
+    h5_group.attrs['ScopeFoundry_type'] = 'Measurement'
+    save_attrs(h5_group.create_group('settings'), measure_settings)
+
+    if length is None:
+        image_h5 = h5_group.create_dataset(name = 't0/c0/image',
+                                           shape = [0, *frame_shape],
+                                           maxshape = [None, *frame_shape],
+                                           chunks = (1, *frame_shape),
+                                           dtype = dtype)
+    else:
+        image_h5 = h5_group.create_dataset(name = 't0/c0/image',
+                                           shape = [length, *frame_shape],
+                                           dtype = dtype)
+    image_h5.attrs['element_size_um'] = [measure_settings.get('zsampling', 1.0),
+                                         measure_settings.get('ysampling', 1.0),
+                                         measure_settings.get('xsampling', 1.0)]
+    return h5file, image_h5
+
+
+def save_attrs(group, settings):
+    for key, value in settings.items():
+        group.attrs[key] = value
+
+
+def get_file_name(save_dir, sample):
+    timestamp = time.strftime("%y%m%d_%H%M%S", time.localtime())
+    if sample == '':
+        sample_name = '_'.join([timestamp, MEASURE_NAME])
+    else:
+        sample_name = '_'.join([timestamp, MEASURE_NAME, sample])
+    return os.path.join(save_dir, sample_name + '.h5')
+
+
+def record(args):
+    profile = load_profile(args.settings)
+    hw_settings = profile.get(HW_SECTION, {})
+    measure_settings = dict(profile.get(MEASURE_SECTION, {}))
+
+    if args.mock:
+        import mock_ids_peak
+        mock_ids_peak.INIT_DELAY = mock_ids_peak.UPDATE_DELAY = 0
+        mock_ids_peak.install()
+    from ids_library import Camera
+
+    cam = Camera(cam_num=args.cam, serial=args.serial)
+    try:
+        configure_camera(cam, hw_settings)
+        frame_num = args.frames
+        if frame_num is None and args.duration is None:
+            frame_num = measure_settings.get('frame_num', 10)
+        if frame_num is not None:
+            cam.set_frame_num(frame_num)
+        else:
+            cam.set_acquisition_mode("Continuous")
+        cam.set_stream_mode("OldestFirst")
+        cam.start_acquisition(buffersize=args.buffer_size)
+
+        img = cam.get_frame()
+        print(f'First frame after {time.perf_counter() - t_start:.3f} s from start')
+
+        save_dir = args.save_dir or profile.get('app', {}).get('save_dir', '.')
+        os.makedirs(save_dir, exist_ok=True)
+        fname = get_file_name(save_dir, args.sample if args.sample is not None
+                                        else str(profile.get('app', {}).get('sample', '')))
+        measure_settings['frame_num'] = frame_num if frame_num is not None else 0
+        h5file, image_h5 = create_h5_file(fname, profile, read_camera_settings(cam),
+                                          measure_settings, img.shape, img.dtype, frame_num)
+        t = time.perf_counter()
+        frame_idx = 0
+        try:
+            while True:
+                if frame_num is None:
+                    image_h5.resize(frame_idx + 1, axis=0)
+                image_h5[frame_idx,:,:] = img
+                frame_idx += 1
+                if frame_num is not None and frame_idx >= frame_num:
+                    break
+                if args.duration is not None and time.perf_counter() - t >= args.duration:
+                    break
+                img = cam.get_frame()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            elapsed = time.perf_counter() - t
+            h5file.flush()
+            h5file.close()
+            cam.stop_acquisition()
+            cam.set_acquisition_mode("Continuous")
+        print(f'Saved {frame_idx} frames in {fname} ({frame_idx/max(elapsed, 1e-9):.1f} fps)')
+    finally:
+        cam.close()
+    return fname
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Record IDS camera frames to HDF5 without the GUI')
+    parser.add_argument('settings', help='ScopeFoundry ini profile, e.g. settings/settings.ini')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--frames', type=int, help='number of frames (default: frame_num of the profile)')
+    group.add_argument('--duration', type=float, help='recording duration in s')
+    parser.add_argument('--save-dir', help='saving directory (default: save_dir of the profile)')
+    parser.add_argument('--sample', help='sample name appended to the file name')
+    parser.add_argument('--cam', type=int, default=0, help='camera index')
+    parser.add_argument('--serial', help='camera serial number, overrides --cam')
+    parser.add_argument('--buffer-size', type=int, default=1000, help='number of camera buffers')
+    parser.add_argument('--mock', action='store_true', help='use the emulated camera of mock_ids_peak')
+    return record(parser.parse_args(argv))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,502 @@
+# -*- coding: utf-8 -*-
+"""
+Minimal software emulation of the IDS peak python API (ids_peak and ids_peak_ipl_extension),
+covering the calls used by ids_library. Used to run benchmarks without a camera:
+
+    import mock_ids_peak
+    mock_ids_peak.install()   # before importing ids_library
+    from ids_library import Camera
+
+Frames are generated at the configured AcquisitionFrameRate.
+Library initialization and device enumeration sleep for INIT_DELAY and UPDATE_DELAY seconds
+to reproduce the cost of the real stack.
+Transport faults are emulated by _Device.stall (no frames until the data stream is restarted) 
+and _Device.fail_link (no frames until the device is reopened).
+"""
+import sys
+import time
+import types
+import queue
+import numpy as np
+
+INIT_DELAY = 0.5
+UPDATE_DELAY = 1.0
+DEVICE_NUM = 1
+
+NodeAccessStatus_ReadWrite = 0
+NodeAccessStatus_NotAvailable = 1
+NodeAccessStatus_NotImplemented = 2
+DeviceAccessType_Control = 0
+AcquisitionStartMode_Default = 0
+AcquisitionStopMode_Default = 0
+DataStreamFlushMode_DiscardAll = 0
+
+# nodes that change the payload and cannot be written while the camera acquires
+_LOCKED_NODES = ("Width", "Height", "PixelFormat")
+
+
+class TimeoutException(Exception):
+    pass
+
+
+class BadAccessException(Exception):
+    pass
+
+
+class _Entry:
+
+    def __init__(self, symbolic, status=NodeAccessStatus_ReadWrite):
+        self._symbolic = symbolic
+        self._status = status
+
+    def SymbolicValue(self):
+        return self._symbolic
+
+    def AccessStatus(self):
+        return self._status
+
+
+class _Node:
+    """ Generic GenICam node: integer/float, enumeration or command"""
+
+    def __init__(self, nodemap, name, value=None, minimum=None, maximum=None, entries=None, command=None):
+        self._nodemap = nodemap
+        self._name = name
+        self._value = value
+        self._minimum = minimum
+        self._maximum = maximum
+        self._entries = entries
+        self._command = command
+
+    def AccessStatus(self):
+        return NodeAccessStatus_ReadWrite
+
+    def Value(self):
+        if callable(self._value):
+            return self._value()
+        return self._value
+
+    def Minimum(self):
+        return self._minimum() if callable(self._minimum) else self._minimum
+
+    def Maximum(self):
+        return self._maximum() if callable(self._maximum) else self._maximum
+
+    def SetValue(self, value):
+        if self._name in _LOCKED_NODES and self._nodemap.locked:
+            raise BadAccessException(f"{self._name} is not writeable while acquiring")
+        if self._minimum is not None and not self.Minimum() <= value <= self.Maximum():
+            raise ValueError(f"{self._name}: {value} out of range")
+        self._value = value
+        self._nodemap.on_change(self._name)
+
+    def Entries(self):
+        return [_Entry(e) for e in self._entries]
+
+    def CurrentEntry(self):
+        return _Entry(self._value)
+
+    def SetCurrentEntry(self, value):
+        if value not in self._entries:
+            raise ValueError(f"{self._name}: entry {value} not available")
+        self.SetValue(value)
+
+    def Execute(self):
+        self._command()
+
+    def WaitUntilDone(self):
+        pass
+
+
+class _RemoteNodeMap:
+
+    def __init__(self, device):
+        self.device = device
+        self.locked = False
+        self.triggers = queue.Queue()
+        self.latch_ns = 0
+        n = self._nodes = {}
+        n["SensorWidth"] = _Node(self, "SensorWidth", 1936)
+        n["SensorHeight"] = _Node(self, "SensorHeight", 1096)
+        n["Width"] = _Node(self, "Width", 1936, 16, lambda: 1936 - self.value("OffsetX"))
+        n["Height"] = _Node(self, "Height", 1096, 2, lambda: 1096 - self.value("OffsetY"))
+        n["OffsetX"] = _Node(self, "OffsetX", 0, 0, lambda: 1936 - self.value("Width"))
+        n["OffsetY"] = _Node(self, "OffsetY", 0, 0, lambda: 1096 - self.value("Height"))
+        n["PixelFormat"] = _Node(self, "PixelFormat", "Mono8", entries=["Mono8", "Mono10", "Mono12"])
+        n["PayloadSize"] = _Node(self, "PayloadSize", lambda: self.value("Width")*self.value("Height")*self.bytes_per_pixel())
+        n["ExposureTime"] = _Node(self, "ExposureTime", 10000., 28., lambda: 1e6/self.value("AcquisitionFrameRate"))
+        n["AcquisitionFrameRate"] = _Node(self, "AcquisitionFrameRate", 20., 0.1, self.max_frame_rate)
+        n["Gain"] = _Node(self, "Gain", 1., 1., 10.)
+        n["AcquisitionMode"] = _Node(self, "AcquisitionMode", "Continuous", entries=["Continuous", "MultiFrame", "SingleFrame"])
+        n["AcquisitionFrameCount"] = _Node(self, "AcquisitionFrameCount", 1, 1, 2**31)
+        n["AcquisitionStart"] = _Node(self, "AcquisitionStart", command=self.acquisition_start)
+        n["AcquisitionStop"] = _Node(self, "AcquisitionStop", command=self.acquisition_stop)
+        n["TLParamsLocked"] = _Node(self, "TLParamsLocked", 0, 0, 1)
+        n["TriggerSelector"] = _Node(self, "TriggerSelector", "FrameStart", entries=["FrameStart"])
+        n["TriggerMode"] = _Node(self, "TriggerMode", "Off", entries=["Off", "On"])
+        n["TriggerSource"] = _Node(self, "TriggerSource", "Line0", entries=["Line0", "Line2", "Line3", "Software"])
+        n["TriggerActivation"] = _Node(self, "TriggerActivation", "RisingEdge", entries=["RisingEdge", "FallingEdge"])
+        n["TriggerDelay"] = _Node(self, "TriggerDelay", 0., 0., 2e6)
+        n["TriggerSoftware"] = _Node(self, "TriggerSoftware", command=lambda: self.triggers.put(time.perf_counter()))
+        n["ExposureMode"] = _Node(self, "ExposureMode", "Timed", entries=["Timed", "TriggerControlled"])
+        n["LineSelector"] = _Node(self, "LineSelector", "Line1", entries=["Line0", "Line1", "Line2", "Line3"])
+        n["LineMode"] = _Node(self, "LineMode", "Output", entries=["Input", "Output"])
+        n["LineSource"] = _Node(self, "LineSource", "Off", entries=["Off", "ExposureActive", "UserOutput0"])
+        n["TimestampLatch"] = _Node(self, "TimestampLatch", command=self.latch)
+        n["TimestampLatchValue"] = _Node(self, "TimestampLatchValue", lambda: self.latch_ns)
+        n["DeviceTemperature"] = _Node(self, "DeviceTemperature", 35.)
+
+    def FindNode(self, name):
+        return self._nodes[name]
+
+    def value(self, name):
+        return self._nodes[name].Value()
+
+    def on_change(self, name):
+        pass
+
+    def bytes_per_pixel(self):
+        return 1 if self.value("PixelFormat") == "Mono8" else 2
+
+    def max_frame_rate(self):
+        # readout limited by the number of rows, exposure limited for long exposures
+        return min(60. * 1096 / self.value("Height"), 1e6 / self.value("ExposureTime"))
+
+    def acquisition_start(self):
+        self.locked = True
+        for stream in self.device.streams:
+            stream.on_acquisition_start()
+
+    def acquisition_stop(self):
+        self.locked = False
+        for stream in self.device.streams:
+            stream.on_acquisition_stop()
+
+    def latch(self):
+        self.latch_ns = self.device.clock_ns()
+
+
+class _Buffer:
+
+    def __init__(self, size):
+        self.size = size
+        self.array = None
+        self._frame_id = 0
+        self._timestamp_ns = 0
+
+    def FrameID(self):
+        return self._frame_id
+
+    def Timestamp_ns(self):
+        return self._timestamp_ns
+
+
+class _StreamNodeMap:
+
+    def __init__(self, stream):
+        n = self._nodes = {}
+        n["StreamBufferHandlingMode"] = _Node(self, "StreamBufferHandlingMode", "OldestFirst",
+                                              entries=["NewestOnly", "OldestFirst", "OldestFirstSingleBuffer",
+                                                       "OldestFirstDependOnCameraFIFO"])
+        n["StreamIsGrabbing"] = _Node(self, "StreamIsGrabbing", lambda: stream.grabbing)
+        n["StreamDeliveredFrameCount"] = _Node(self, "StreamDeliveredFrameCount", lambda: stream.delivered)
+        n["StreamLostFrameCount"] = _Node(self, "StreamLostFrameCount", lambda: stream.lost)
+        n["StreamInputBufferCount"] = _Node(self, "StreamInputBufferCount", lambda: len(stream.queued))
+        n["StreamOutputBufferCount"] = _Node(self, "StreamOutputBufferCount", 0)
+        self.locked = False
+
+    def FindNode(self, name):
+        return self._nodes[name]
+
+    def on_change(self, name):
+        pass
+
+
+class _DataStream:
+
+    def __init__(self, device):
+        self.device = device
+        self.nodemap = _StreamNodeMap(self)
+        self.announced = []
+        self.queued = []
+        self.grabbing = False
+        self.running = False
+        self.delivered = 0
+        self.lost = 0
+        self._frame_id = 0
+        self._generated = 0
+        self._next_t = 0.
+        self._frame = None
+
+    def NodeMaps(self):
+        return [self.nodemap]
+
+    def NumBuffersAnnouncedMinRequired(self):
+        return 1
+
+    def AllocAndAnnounceBuffer(self, size):
+        buffer = _Buffer(size)
+        self.announced.append(buffer)
+        return buffer
+
+    def AnnouncedBuffers(self):
+        return list(self.announced)
+
+    def RevokeBuffer(self, buffer):
+        self.announced.remove(buffer)
+        if buffer in self.queued:
+            self.queued.remove(buffer)
+
+    def QueueBuffer(self, buffer):
+        if buffer not in self.announced:
+            raise BadAccessException("Buffer not announced")
+        self.queued.append(buffer)
+
+    def Flush(self, mode):
+        self.queued = list(self.announced)
+
+    def StartAcquisition(self, mode=AcquisitionStartMode_Default, count=None):
+        if self.device.link_down:
+            raise BadAccessException("Device not responding")
+        self.device.stalled = False
+        self.grabbing = True
+
+    def StopAcquisition(self, mode=AcquisitionStopMode_Default):
+        self.grabbing = False
+
+    def on_acquisition_start(self):
+        nm = self.device.nodemap
+        height, width = nm.value("Height"), nm.value("Width")
+        dtype = np.uint8 if nm.bytes_per_pixel() == 1 else np.uint16
+        rng = np.random.default_rng(self._frame_id)
+        self._frame = rng.integers(0, 200, (height, width)).astype(dtype)
+        self._generated = 0
+        self._next_t = time.perf_counter() + 1/nm.value("AcquisitionFrameRate")
+        while not nm.triggers.empty():
+            nm.triggers.get_nowait()
+        self.running = True
+
+    def on_acquisition_stop(self):
+        self.running = False
+
+    def _frame_limit(self):
+        mode = self.device.nodemap.value("AcquisitionMode")
+        if mode == "SingleFrame":
+            return 1
+        if mode == "MultiFrame":
+            return self.device.nodemap.value("AcquisitionFrameCount")
+        return None
+
+    def _next_frame_time(self, deadline):
+        """ Returns the readout time of the next frame, or None if no frame comes before deadline"""
+        nm = self.device.nodemap
+        limit = self._frame_limit()
+        if not self.running or (limit is not None and self._generated >= limit):
+            return None
+        if nm.value("TriggerMode") == "On":
+            try:
+                t_trigger = nm.triggers.get(timeout=max(0, deadline - time.perf_counter()))
+            except queue.Empty:
+                return None
+            return t_trigger + (nm.value("TriggerDelay") + nm.value("ExposureTime"))/1e6
+        period = 1/nm.value("AcquisitionFrameRate")
+        now = time.perf_counter()
+        if now > self._next_t + period:
+            # the host is late: the frames that do not fit in the queued buffers are lost
+            backlog = int((now - self._next_t) / period)
+            if limit is not None:
+                backlog = min(backlog, limit - self._generated - 1) # no frames after the last one
+            if self.nodemap.FindNode("StreamBufferHandlingMode").Value() == "NewestOnly":
+                skipped = backlog
+            else:
+                skipped = max(0, backlog - len(self.queued))
+                self.lost += skipped
+            self._frame_id += skipped
+            self._generated += skipped
+            self._next_t += skipped * period
+        t_frame = self._next_t
+        self._next_t += period
+        return t_frame if t_frame <= deadline else None
+
+    def WaitForFinishedBuffer(self, timeout_ms):
+        deadline = time.perf_counter() + timeout_ms/1000
+        if self.device.stalled or self.device.link_down:
+            time.sleep(timeout_ms/1000)
+            raise TimeoutException("Wait for finished buffer timeout")
+        t_frame = self._next_frame_time(deadline) if self.queued else None
+        if t_frame is None:
+            time.sleep(max(0, deadline - time.perf_counter()))
+            raise TimeoutException("Wait for finished buffer timeout")
+        delay = t_frame - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        buffer = self.queued.pop(0)
+        if buffer.array is None or buffer.array.shape != self._frame.shape or buffer.array.dtype != self._frame.dtype:
+            buffer.array = np.empty_like(self._frame)
+        np.copyto(buffer.array, self._frame)
+        buffer._frame_id = self._frame_id
+        buffer._timestamp_ns = self.device.clock_ns(t_frame) - int(self.device.nodemap.value("ExposureTime")*1000)
+        self._frame_id += 1
+        self._generated += 1
+        self.delivered += 1
+        return buffer
+
+
+class _DataStreamDescriptor:
+
+    def __init__(self, device):
+        self.device = device
+
+    def OpenDataStream(self):
+        if self.device.streams:
+            raise BadAccessException("Data stream already open")
+        stream = _DataStream(self.device)
+        self.device.streams.append(stream)
+        return stream
+
+
+class _RemoteDevice:
+
+    def __init__(self, nodemap):
+        self._nodemap = nodemap
+
+    def NodeMaps(self):
+        return [self._nodemap]
+
+
+class _Device:
+
+    def __init__(self, descriptor):
+        self.descriptor = descriptor
+        self.streams = []
+        self.nodemap = _RemoteNodeMap(self)
+        self._clock_offset_ns = 1_000_000_000_000 # device clock is unrelated to the host clock
+        self.stalled = False
+        self.link_down = False
+
+    def stall(self):
+        """ Emulates a transient transport fault: no frames until the data stream is restarted"""
+        self.stalled = True
+
+    def fail_link(self):
+        """ Emulates a lost link: no frames, and the data stream cannot be restarted until the device is reopened"""
+        self.link_down = True
+
+    def clock_ns(self, t=None):
+        if t is None:
+            t = time.perf_counter()
+        return int(t*1e9) + self._clock_offset_ns
+
+    def Close(self):
+        self.streams = []
+        self.descriptor.device = None
+
+    def ModelName(self):
+        return self.descriptor.ModelName()
+
+    def SerialNumber(self):
+        return self.descriptor.SerialNumber()
+
+    def RemoteDevice(self):
+        return _RemoteDevice(self.nodemap)
+
+    def DataStreams(self):
+        return [_DataStreamDescriptor(self)]
+
+
+class _DeviceDescriptor:
+
+    def __init__(self, index):
+        self._serial = f"4108{index:06d}"
+        self.device = None
+
+    def ModelName(self):
+        return "U3-MOCK-M"
+
+    def SerialNumber(self):
+        return self._serial
+
+    def IsOpenable(self):
+        return self.device is None
+
+    def OpenDevice(self, access_type):
+        if self.device is not None:
+            raise BadAccessException("Device already open")
+        self.device = _Device(self)
+        return self.device
+
+
+class _DeviceList(list):
+
+    def empty(self):
+        return len(self) == 0
+
+    def size(self):
+        return len(self)
+
+
+class DeviceManager:
+
+    _instance = None
+
+    def __init__(self):
+        self._descriptors = [_DeviceDescriptor(i) for i in range(DEVICE_NUM)]
+        self._devices = _DeviceList()
+
+    @classmethod
+    def Instance(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def Update(self):
+        time.sleep(UPDATE_DELAY)
+        self._devices = _DeviceList(self._descriptors)
+
+    def Devices(self):
+        return self._devices
+
+
+class Library:
+
+    initialized = False
+    initialize_count = 0
+
+    @classmethod
+    def Initialize(cls):
+        time.sleep(INIT_DELAY)
+        cls.initialized = True
+        cls.initialize_count += 1
+
+    @classmethod
+    def Close(cls):
+        cls.initialized = False
+        # closing the library releases all the devices
+        for descriptor in DeviceManager.Instance()._descriptors:
+            descriptor.device = None
+        DeviceManager._instance = None
+
+
+class _IplImage:
+
+    def __init__(self, array):
+        self._array = array
+
+    def get_numpy(self):
+        return self._array
+
+
+def BufferToImage(buffer):
+    return _IplImage(buffer.array)
+
+
+def install():
+    """ Registers this module as the ids_peak package,
+    so that 'from ids_peak import ids_peak' imports the emulation"""
+    this = sys.modules[__name__]
+    package = types.ModuleType("ids_peak")
+    package.ids_peak = this
+    package.ids_peak_ipl_extension = this
+    sys.modules["ids_peak"] = package
+    sys.modules["ids_peak.ids_peak"] = this
+    sys.modules["ids_peak.ids_peak_ipl_extension"] = this
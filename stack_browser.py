@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+On-demand access to large recorded stacks.
+
+StackBrowser reads the frames of a t0/c0/image HDF5 dataset when requested, keeps the
+recently used ones in an LRU cache and reads ahead in the scrub direction in a background thread,
+so that the access time does not depend on the file size.
+The thumbnail pyramid (t0/c0/thumbnails/level<n>, frames subsampled by ThumbnailFactor**n)
+is written at save time by ThumbnailWriter and gives an instant low-resolution overview.
+"""
+from collections import OrderedDict
+import threading
+
+IMAGE_PATH = 't0/c0/image'
+THUMBNAIL_PATH = 't0/c0/thumbnails'
+ThumbnailFactor = 4
+ThumbnailLevels = 2
+MIN_THUMBNAIL_SIZE = 8
+
+
+def find_image_dataset(h5file, path=IMAGE_PATH):
+    """ Returns the first dataset of h5file whose name ends with path"""
+    import h5py
+    paths = []
+    h5file.visititems(lambda name, obj: paths.append(name)
+                      if isinstance(obj, h5py.Dataset) and name.endswith(path) else None)
+    if not paths:
+        raise ValueError(f'No {path} dataset in {h5file.filename}')
+    return h5file[paths[0]]
+
+
+class ThumbnailWriter:
+    """ Creates the thumbnail pyramid next to the image dataset and fills it while saving"""
+
+    def __init__(self, h5_group, length, frame_shape, dtype, levels=ThumbnailLevels):
+        self.datasets = []
+        if length == 0:
+            return # an empty stack has no thumbnails, and h5py refuses chunks larger than the dataset
+        for level in range(1, levels + 1):
+            step = ThumbnailFactor ** level
+            shape = [-(-size // step) for size in frame_shape]
+            if min(shape) < MIN_THUMBNAIL_SIZE:
+                break
+            dset = h5_group.create_dataset(name = f'{THUMBNAIL_PATH}/level{level}',
+                                           shape = [length, *shape], dtype = dtype,
+                                           chunks = (1, *shape))
+            dset.attrs['step'] = step
+            self.datasets.append((step, dset))
+
+    def write(self, index, frames):
+        """ Writes the thumbnails of a frame (index is an int) or of a block of frames (index is a slice)"""
+        for step, dset in self.datasets:
+            dset[index] = frames[..., ::step, ::step]
+
+
+class StackBrowser:
+
+    def __init__(self, fname, cache_frames=64, read_ahead=8):
+        import h5py
+        self.h5file = h5py.File(fname, 'r')
+        self.dataset = find_image_dataset(self.h5file)
+        self.length = len(self.dataset)
+        self.thumbnails = {}
+        thumb_path = self.dataset.parent.name + '/thumbnails'
+        if thumb_path in self.h5file:
+            for name, dset in self.h5file[thumb_path].items():
+                self.thumbnails[int(name.replace('level', ''))] = dset
+        self.cache_frames = max(1, cache_frames)
+        self.read_ahead = read_ahead
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()    # cache
+        self._io_lock = threading.Lock() # file reads
+        self._request = threading.Condition()
+        self._target = None
+        self._last_index = 0
+        self._running = True
+        self._reader = threading.Thread(target=self._read_ahead_loop, daemon=True)
+        self._reader.start()
+
+    @property
+    def levels(self):
+        return sorted(self.thumbnails)
+
+    def _cached(self, index):
+        with self._lock:
+            frame = self._cache.get(index)
+            if frame is not None:
+                self._cache.move_to_end(index)
+            return frame
+
+    def _load(self, index):
+        frame = self._cached(index)
+        if frame is not None:
+            return frame
+        with self._io_lock:
+            frame = self.dataset[index]
+        with self._lock:
+            self._cache[index] = frame
+            while len(self._cache) > self.cache_frames:
+                self._cache.popitem(last=False)
+        return frame
+
+    def get_frame(self, index):
+        """ Returns the full-resolution frame, and reads ahead in the scrub direction"""
+        index = int(min(max(index, 0), self.length - 1))
+        frame = self._load(index)
+        direction = 1 if index >= self._last_index else -1
+        self._last_index = index
+        with self._request:
+            self._target = (index, direction)
+            self._request.notify()
+        return frame
+
+    def get_thumbnail(self, index, level=1):
+        """ Returns the frame subsampled at the given pyramid level (0 is full resolution)"""
+        if level == 0 or level not in self.thumbnails:
+            return self.get_frame(index)
+        index = int(min(max(index, 0), self.length - 1))
+        return self.thumbnails[level][index]
+
+    def _read_ahead_loop(self):
+        while self._running:
+            with self._request:
+                while self._target is None and self._running:
+                    self._request.wait()
+                target = self._target
+                self._target = None
+            if target is None:
+                break
+            index, direction = target
+            # read ahead at most half of the cache, to keep the frames behind for scrubbing back
+            for step in range(1, min(self.read_ahead, self.cache_frames // 2) + 1):
+                if self._target is not None or not self._running:
+                    break # a new request supersedes this one
+                ahead = index + direction * step
+                if 0 <= ahead < self.length:
+                    self._load(ahead)
+
+    def close(self):
+        self._running = False
+        with self._request:
+            self._request.notify()
+        self._reader.join()
+        self.h5file.close()
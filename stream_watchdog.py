@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Watchdog for long, unattended recordings.
+
+StreamWatchdog reads the frames through Camera.get_frames and detects transport faults:
+a stream that delivers no frame for stall_s seconds, or a StreamLostFrameCount that rises
+by more than lost_limit frames in check_s seconds while input buffers are available
+(frames lost on the link, not because the host is late).
+The stream is then restarted with Camera.recover_stream, reopening the device from the second attempt,
+and the gap is logged, so that the caller keeps writing to the same dataset.
+While the stream is down, interrupted() is polled: when it returns True, InterruptedError is raised.
+"""
+import time
+
+POLL_S = 0.05 # longest sleep between two checks of interrupted()
+
+
+class StreamWatchdog:
+
+    def __init__(self, camera, stall_s=2.0, lost_limit=10, check_s=1.0, retries=5, interrupted=None):
+        """
+        Args:
+            camera: ids_library.Camera, with the acquisition already started
+            stall_s (float): time without frames after which the stream is restarted
+            lost_limit (int): lost frames per check_s that trigger a restart
+            retries (int): recovery attempts before the fault is raised
+            interrupted (callable): returns True to stop waiting for a stalled stream
+        """
+        self.camera = camera
+        self.stall_s = stall_s
+        self.lost_limit = lost_limit
+        self.check_s = check_s
+        self.retries = retries
+        self.interrupted = interrupted
+        self.frames = 0 # frames returned so far
+        self.gaps = []  # (frame_index, duration_s, reason, reopened)
+        self._last_check = time.perf_counter()
+        self._last_lost = camera.get_lost_frame_count()
+
+    def get_frames(self, n, out=None):
+        """ Returns (frames, frame_ids, timestamps_ns) as Camera.get_frames,
+        recovering the stream if it stalls"""
+        t_wait = t_fault = time.perf_counter()
+        timeout_ms = int(min(self.stall_s, 1.0) * 1000)
+        recoveries = 0
+        while True:
+            try:
+                frames, frame_ids, timestamps = self.camera.get_frames(n, out=out, timeout_ms=timeout_ms)
+                break
+            except self.camera.stream_errors as e: # other errors are not faults of the stream
+                self.check_interrupted()
+                if time.perf_counter() - t_wait < self.stall_s:
+                    continue
+                if recoveries >= self.retries:
+                    raise TimeoutError(f'No frames after {recoveries} stream recoveries') from e
+                # if a restarted stream still stalls, the device is reopened
+                self.recover(t_fault, f'stall: {e}', reopen = recoveries > 0)
+                recoveries += 1
+                t_wait = time.perf_counter()
+        self.frames += len(frames)
+        if time.perf_counter() - self._last_check > self.check_s:
+            self.check_lost_frames()
+        return frames, frame_ids, timestamps
+
+    def check_interrupted(self):
+        if self.interrupted is not None and self.interrupted():
+            raise InterruptedError(f'Interrupted while the stream was down, at frame {self.frames}')
+
+    def _sleep(self, duration):
+        """ Sleeps, checking for an interruption every POLL_S"""
+        t_end = time.perf_counter() + duration
+        while True:
+            self.check_interrupted()
+            remaining = t_end - time.perf_counter()
+            if remaining <= 0:
+                return
+            time.sleep(min(remaining, POLL_S))
+
+    def check_lost_frames(self):
+        lost = self.camera.get_lost_frame_count()
+        rise = lost - self._last_lost
+        self._last_check = time.perf_counter()
+        self._last_lost = lost
+        if rise > self.lost_limit:
+            _, _, _, in_cnt, _, _ = self.camera.get_buffer_count()
+            if in_cnt: # buffers were available: the frames were lost on the link
+                self.recover(self._last_check, f'{rise} frames lost')
+
+    def recover(self, t_fault, reason, reopen=False):
+        """ Restarts the stream, retrying with increasing waits, and logs the gap"""
+        print(f'Stream fault at frame {self.frames} ({reason}): recovering')
+        for attempt in range(self.retries):
+            self.check_interrupted()
+            try:
+                reopened = self.camera.recover_stream(reopen = reopen or attempt > 0)
+                break
+            except Exception as e:
+                print(f'Recovery attempt {attempt+1} failed: {e}')
+                self._sleep(0.5 * (attempt + 1)) # leave time to the device to enumerate again
+        else:
+            raise TimeoutError(f'Stream not recovered after {self.retries} attempts ({reason})')
+        duration = time.perf_counter() - t_fault
+        self.gaps.append((self.frames, duration, reason, reopened))
+        self._last_lost = self.camera.get_lost_frame_count()
+        print(f'Stream recovered after {duration:.2f} s' + (', device reopened' if reopened else ''))
+
+    def save_gaps(self, attrs):
+        """ Stores the gaps as 'frame_index duration_s reopened reason' strings"""
+        if self.gaps:
+            attrs['stream_gaps'] = [f'{index} {duration:.3f} {int(reopened)} {reason}'
+                                    for index, duration, reason, reopened in self.gaps]
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Time-lapse scheduler.
+
+TimeLapse captures a burst of frames at each time point t0 + n*interval, with the camera
+armed once (Camera.arm_bursts): one buffer pool and one running data stream for the whole run.
+The scheduler sleeps until spin_s before each time point, in slices of at most poll_s
+to check for an interruption, and busy-waits the rest,
+so that a burst is started by a single command (AcquisitionStart or TriggerSoftware) on time.
+A time point that cannot start on time (the previous one overran the interval) starts immediately
+and is counted as late; the schedule keeps its phase.
+"""
+import time
+import numpy as np
+
+ModeChoices = ['MultiFrame', 'Software']
+POLL_S = 0.05 # longest sleep between two checks of interrupted()
+
+
+class TimeLapse:
+
+    def __init__(self, camera, points, interval_s, frames=1, mode='MultiFrame', spin_s=0.002, timeout_ms=1000):
+        """
+        Args:
+            camera: ids_library.Camera
+            points (int): number of time points
+            interval_s (float): time between the starts of consecutive time points
+            frames (int): frames per time point
+            mode (str): one of ModeChoices, see Camera.arm_bursts
+        """
+        if mode not in ModeChoices:
+            raise ValueError(f'Unknown time-lapse mode: {mode}')
+        self.camera = camera
+        self.points = int(points)
+        self.interval_s = float(interval_s)
+        self.frames = int(frames)
+        self.mode = mode
+        self.spin_s = spin_s
+        self.timeout_ms = timeout_ms
+        self.block = None
+        self.deadlines = []
+        self.start_times = []   # host time of each burst start
+        self.first_frame_ns = [] # device timestamp of the first frame of each burst
+        self.busy_times = []    # from the burst start to the data written
+        self.overheads = []     # host time per point besides waiting for the frames
+
+    def _wait_until(self, deadline, interrupted=None):
+        """ Waits until deadline. Returns False if interrupted() became True before"""
+        while True:
+            if interrupted is not None and interrupted():
+                return False
+            remaining = deadline - time.perf_counter()
+            if remaining <= self.spin_s:
+                break
+            time.sleep(min(remaining - self.spin_s, POLL_S))
+        while time.perf_counter() < deadline:
+            time.sleep(0) # yields the GIL to the GUI and writer threads
+        return True
+
+    def _read_burst(self):
+        cam = self.camera
+        count = 0
+        while count < self.frames:
+            frames, _, timestamps = cam.get_frames(self.frames - count, out=self.block[count:],
+                                                   timeout_ms=self.timeout_ms)
+            if count == 0:
+                self.first_frame_ns.append(int(timestamps[0]))
+            count += len(frames)
+        return self.block
+
+    def run(self, write, interrupted=None):
+        """
+        Runs the time-lapse. write(n, frames) is called with the (frames, height, width) burst
+        of time point n, which is overwritten by the next time point.
+        interrupted() is checked while waiting for each time point, to stop early.
+        Returns the number of time points acquired.
+        """
+        cam = self.camera
+        cam.arm_bursts(self.frames, self.mode)
+        self.block = np.empty([self.frames, cam.get_height(), cam.get_width()], dtype=cam.get_frame_dtype())
+        self.deadlines, self.start_times, self.first_frame_ns, self.busy_times, self.overheads = [], [], [], [], []
+        try:
+            t0 = time.perf_counter() + self.spin_s
+            for n in range(self.points):
+                deadline = t0 + n * self.interval_s
+                if not self._wait_until(deadline, interrupted):
+                    break
+                t_start = time.perf_counter()
+                cam.fire_burst()
+                t_fired = time.perf_counter()
+                block = self._read_burst()
+                t_read = time.perf_counter()
+                cam.end_burst()
+                write(n, block)
+                t_done = time.perf_counter()
+                self.deadlines.append(deadline)
+                self.start_times.append(t_start)
+                self.busy_times.append(t_done - t_start)
+                self.overheads.append((t_fired - t_start) + (t_done - t_read))
+        finally:
+            cam.disarm_bursts()
+        return len(self.start_times)
+
+    def get_stats(self):
+        """
+        Returns a dict with the timing of the last run, in ms:
+        interval (mean), jitter (std of the intervals between burst starts), max_error (from the schedule),
+        frame_jitter (std of the intervals between the first frames, from the device timestamps),
+        overhead (mean host time per point to start, re-arm and write, besides waiting for the frames),
+        busy_max (longest time point, the shortest usable interval) and the number of late points.
+        """
+        starts = np.array(self.start_times)
+        stats = {'count': len(starts), 'interval_ms': 0., 'jitter_ms': 0., 'max_error_ms': 0.,
+                 'frame_jitter_ms': 0., 'overhead_ms': 0., 'busy_max_ms': 0., 'late': 0}
+        if len(starts) == 0:
+            return stats
+        errors = starts - np.array(self.deadlines)
+        busy = np.array(self.busy_times)
+        stats['max_error_ms'] = np.abs(errors).max() * 1000
+        stats['late'] = int(np.sum(errors > 0.001)) # started more than 1 ms after the time point
+        stats['overhead_ms'] = np.mean(self.overheads) * 1000
+        stats['busy_max_ms'] = busy.max() * 1000
+        if len(starts) > 1:
+            intervals = np.diff(starts)
+            stats['interval_ms'] = intervals.mean() * 1000
+            stats['jitter_ms'] = intervals.std() * 1000
+            stats['frame_jitter_ms'] = np.diff(np.array(self.first_frame_ns)).std() / 1e6
+        return stats
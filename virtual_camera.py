@@ -0,0 +1,419 @@
+# -*- coding: utf-8 -*-
+"""
+File-backed virtual camera, with the public API of ids_library.Camera.
+Streams frames from a recorded t0/c0/image HDF5 dataset, a .npy stack or a raw binary stack,
+at the recorded frame rate or at maximum speed. It does not need the IDS peak library.
+
+The stack is memory-mapped when possible (uncompressed, contiguous HDF5 datasets, .npy and raw files)
+and a reader thread prefetches the frames in a queue of buffer_size frames.
+The ROI settings crop the recorded frames.
+"""
+import os
+import queue
+import threading
+import time
+import numpy as np
+from stack_browser import find_image_dataset
+
+SpeedChoices = ['recorded', 'max']
+# queue_change setters, and the changes that restart the reader with the new ROI
+ChangeSetters = {'exposure_ms': 'set_exposure_ms', 'gain': 'set_gain', 'frame_rate': 'set_frame_rate',
+                 'offsetx': 'set_offsetx', 'offsety': 'set_offsety', 'width': 'set_width',
+                 'height': 'set_height', 'bit_depth': 'set_bit_depth'}
+RoiChanges = ('offsetx', 'offsety', 'width', 'height')
+
+
+def open_stack(fname, shape=None, dtype=None):
+    """
+    Returns (stack, frame_rate, bit_depth) for an HDF5, .npy or raw file.
+    frame_rate and bit_depth are None if not recorded in the file.
+    For raw files, shape (frames, height, width) and dtype must be given.
+    """
+    ext = os.path.splitext(fname)[1].lower()
+    if ext == '.npy':
+        return np.load(fname, mmap_mode='r'), None, None
+    if ext in ('.h5', '.hdf5'):
+        return _open_h5_stack(fname)
+    if shape is None or dtype is None:
+        raise ValueError('shape and dtype are needed for raw stacks')
+    return np.memmap(fname, dtype=dtype, mode='r', shape=tuple(shape)), None, None
+
+
+def _open_h5_stack(fname):
+    import h5py
+    h5file = h5py.File(fname, 'r')
+    try:
+        dset = find_image_dataset(h5file)
+    except ValueError:
+        h5file.close()
+        raise
+    hw_settings = h5file['hardware/IDS/settings'].attrs if 'hardware/IDS/settings' in h5file else {}
+    frame_rate = hw_settings.get('frame_rate')
+    bit_depth = hw_settings.get('bit_depth')
+    offset = dset.id.get_offset()
+    if dset.chunks is None and offset is not None:
+        # contiguous and uncompressed: map the file directly
+        stack = np.memmap(fname, dtype=dset.dtype, mode='r', offset=offset, shape=dset.shape)
+        h5file.close()
+    else:
+        stack = dset # read through h5py, the file stays open
+    return stack, frame_rate, bit_depth
+
+
+class VirtualCamera:
+
+    stream_errors = (TimeoutError,)
+
+    def __init__(self, fname, speed='recorded', frame_rate=None, shape=None, dtype=None, debug=False):
+        """
+        Args:
+            fname (str): HDF5, .npy or raw stack
+            speed (str): 'recorded' to deliver frames at the frame rate, 'max' as fast as possible
+            frame_rate (float): frame rate, overrides the one recorded in the file
+            shape, dtype: stack shape (frames, height, width) and dtype of raw files
+        """
+        if speed not in SpeedChoices:
+            raise ValueError(f'Unknown speed: {speed}')
+        self.fname = fname
+        self.stack, recorded_rate, bit_depth = open_stack(fname, shape, dtype)
+        self.speed = speed
+        self.frame_rate = float(frame_rate or recorded_rate or 10.)
+        self.bit_depth = int(bit_depth) if bit_depth else (8 if self.stack.dtype == np.uint8 else 16)
+        self.debug = debug
+        _, self.sensor_height, self.sensor_width = self.stack.shape
+        self.roi = [0, 0, self.sensor_width, self.sensor_height]
+        self.exposure_ms = 1000 / self.frame_rate
+        self.gain = 1.
+        self.acquisition_mode = 'Continuous'
+        self.stream_mode = 'OldestFirst'
+        self.trigger_source = 'Internal'
+        self.trigger_delay = 0.
+        self.frame_count = 1
+        self.frame_id = None
+        self.delivered = 0
+        self.lost = 0
+        self.trigger_task = None
+        self.change_log = []
+        self._reader = None
+        self._queue = None
+        self._stop = threading.Event()
+        self._commands = queue.Queue() # changes queued by queue_change, applied by the grabbing thread
+        self._grab_thread = None
+
+    def set_debug_mode(self, value):
+        self.debug = value
+
+    def get_debug_mode(self):
+        return self.debug
+
+    def get_model(self):
+        return 'Virtual ' + os.path.basename(self.fname)
+
+    def get_serial(self):
+        return ''
+
+    def get_width(self):
+        return self.roi[2]
+
+    def get_height(self):
+        return self.roi[3]
+
+    def get_offsetx(self):
+        return self.roi[0]
+
+    def get_offsety(self):
+        return self.roi[1]
+
+    def set_width(self, w):
+        x, y, _, h = self.get_active_region()
+        self.set_active_region(x, y, w, h)
+
+    def set_height(self, h):
+        x, y, w, _ = self.get_active_region()
+        self.set_active_region(x, y, w, h)
+
+    def set_offsetx(self, x):
+        _, y, w, h = self.get_active_region()
+        self.set_active_region(x, y, w, h)
+
+    def set_offsety(self, y):
+        x, _, w, h = self.get_active_region()
+        self.set_active_region(x, y, w, h)
+
+    def get_size(self):
+        return self.sensor_width, self.sensor_height
+
+    def set_full_chip(self):
+        self.roi = [0, 0, self.sensor_width, self.sensor_height]
+
+    def set_active_region(self, x, y, w, h):
+        w = int(np.clip(w, 1, self.sensor_width))
+        h = int(np.clip(h, 1, self.sensor_height))
+        x = int(np.clip(x, 0, self.sensor_width - w))
+        y = int(np.clip(y, 0, self.sensor_height - h))
+        self.roi = [x, y, w, h]
+
+    def get_active_region(self):
+        return tuple(self.roi)
+
+    def get_frame_rate(self):
+        return self.frame_rate
+
+    def set_frame_rate(self, framerate):
+        self.frame_rate = float(framerate)
+
+    def get_exposure_ms(self):
+        return self.exposure_ms
+
+    def set_exposure_ms(self, value):
+        self.exposure_ms = value
+
+    def get_max_exposure_ms(self):
+        return 1000 / self.frame_rate
+
+    def set_gain(self, value):
+        self.gain = value
+
+    def get_gain(self):
+        return self.gain
+
+    def get_max_gain(self):
+        return 1.
+
+    def get_available_bit_depths(self):
+        return [f'Mono{self.bit_depth}']
+
+    def set_bit_depth(self, numeric_value):
+        pass # fixed by the recorded stack
+
+    def get_bit_depth(self):
+        return self.bit_depth
+
+    def get_frame_dtype(self):
+        return self.stack.dtype
+
+    def set_frame_num(self, nframes):
+        self.acquisition_mode = 'MultiFrame'
+        self.frame_count = int(nframes)
+
+    def set_acquisition_mode(self, mode='Continuous'):
+        self.acquisition_mode = mode
+
+    def get_acquisition_mode(self):
+        return self.acquisition_mode
+
+    def set_stream_mode(self, value):
+        self.stream_mode = value
+
+    def get_stream_mode(self):
+        return self.stream_mode
+
+    def set_trigger_source(self, source):
+        self.trigger_source = str(source)
+
+    def get_trigger_source(self):
+        return self.trigger_source
+
+    def set_trigger_delay(self, delay_ms):
+        self.trigger_delay = delay_ms
+
+    def get_trigger_delay(self):
+        return self.trigger_delay
+
+    def set_line_output(self, line='Line1', source='ExposureActive'):
+        pass
+
+    def start_trigger_task(self, rate, count=None, spin_s=0.002, on_done=None):
+        pass
+
+    def _stop_trigger_task(self):
+        pass
+
+    def get_trigger_stats(self):
+        return {'count': 0, 'rate': 0., 'period_ms': 0., 'jitter_ms': 0., 'max_error_ms': 0.}
+
+    def set_low_latency(self, enable):
+        pass # frames are read from the file, there is no exposure to measure against
+
+    def get_low_latency(self):
+        return False
+
+    def get_latency_stats(self):
+        return {'count': 0, 'mean': 0., 'p50': 0., 'p99': 0., 'max': 0.}
+
+    def get_latency_histogram(self, bins=50):
+        return np.histogram([], bins=bins)
+
+    def reset_latency(self):
+        pass
+
+    def queue_change(self, name, value, wait_s=0.2):
+        """ Changes a setting while grabbing, as ids_library.Camera.queue_change:
+        the change is applied by the grabbing thread before the next frame.
+        ROI changes restart the reader from the next frame, discarding the prefetched frames.
+        """
+        if name not in ChangeSetters:
+            raise ValueError(f"Unknown setting: {name}")
+        if self._reader is None:
+            getattr(self, ChangeSetters[name])(value)
+            return True
+        done = threading.Event()
+        self._commands.put((name, value, done))
+        if threading.get_ident() == self._grab_thread:
+            self._apply_changes()
+        elif not done.wait(wait_s):
+            print(f"{name} change to {value} queued: it will be applied before the next frame")
+            return False
+        return True
+
+    def _apply_changes(self):
+        while not self._commands.empty():
+            name, value, done = self._commands.get_nowait()
+            try:
+                getattr(self, ChangeSetters[name])(value)
+                if name in RoiChanges:
+                    self._restart_reader()
+                elif name == 'frame_rate':
+                    self._t0 = time.perf_counter() - self.delivered / self.frame_rate # keeps the pace
+                self.change_log.append((self.delivered, name, value))
+            except Exception as e:
+                print(f"Cannot change {name} to {value}: {e}")
+            finally:
+                done.set()
+
+    def _restart_reader(self):
+        """ Restarts the reader at the next frame, with the current ROI"""
+        self._stop.set()
+        self._reader.join()
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self._stop.clear()
+        self._reader = threading.Thread(target=self._read_loop, args=(self._frame_limit(), self.delivered), daemon=True)
+        self._reader.start()
+
+    def arm_bursts(self, frames, mode='MultiFrame'):
+        self.stop_acquisition()
+        self.set_frame_num(frames)
+
+    def fire_burst(self):
+        self.start_acquisition(self.frame_count) # each burst replays the first frames of the stack
+
+    def end_burst(self):
+        self.stop_acquisition()
+
+    def disarm_bursts(self):
+        self.stop_acquisition()
+        self.set_acquisition_mode('Continuous')
+
+    def get_lost_frame_count(self):
+        return self.lost
+
+    def recover_stream(self, reopen=False):
+        return False # the file cannot stall
+
+    def get_buffer_count(self):
+        grabbing = self._reader is not None
+        in_cnt = self._queue.qsize() if self._queue is not None else 0
+        if self.debug:
+            print(f"grabbing={grabbing} delivered={self.delivered} lost={self.lost} in={in_cnt} out=0 frameID={self.frame_id}")
+        return grabbing, self.delivered, self.lost, in_cnt, 0, self.frame_id
+
+    def _frame_limit(self):
+        if self.acquisition_mode == 'SingleFrame':
+            return 1
+        if self.acquisition_mode == 'MultiFrame':
+            return self.frame_count
+        return None
+
+    def _read_loop(self, limit, index=0):
+        x, y, w, h = self.roi
+        frames = len(self.stack)
+        while not self._stop.is_set() and (limit is None or index < limit):
+            img = np.array(self.stack[index % frames, y:y+h, x:x+w]) # pages in the mapped frame
+            while not self._stop.is_set():
+                try:
+                    self._queue.put((index, img), timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+            index += 1
+
+    def start_acquisition(self, buffersize=16, live=False):
+        self.stop_acquisition()
+        self._stop.clear()
+        self._queue = queue.Queue(maxsize=max(1, int(buffersize)))
+        self.delivered = 0
+        self.change_log = []
+        self._t0 = time.perf_counter()
+        self._reader = threading.Thread(target=self._read_loop, args=(self._frame_limit(),), daemon=True)
+        self._reader.start()
+
+    def stop_acquisition(self):
+        if self._reader is not None:
+            self._stop.set()
+            self._reader.join()
+            self._reader = None
+        elif self.debug:
+            print("Data stream not running")
+        while not self._commands.empty(): # changes queued after the last frame
+            name, value, done = self._commands.get_nowait()
+            getattr(self, ChangeSetters[name])(value)
+            done.set()
+
+    def get_frame(self, timeout_ms=1000, out=None):
+        """Gets the next frame of the stack, waiting for its time at the 'recorded' speed"""
+        self._grab_thread = threading.get_ident()
+        self._apply_changes()
+        return self._next_frame(timeout_ms, out)
+
+    def _next_frame(self, timeout_ms, out):
+        if self._queue is None:
+            raise TimeoutError('Acquisition not started')
+        if self.speed == 'recorded':
+            t_frame = self._t0 + self.delivered / self.frame_rate
+            delay = t_frame - time.perf_counter()
+            if delay > timeout_ms / 1000:
+                time.sleep(timeout_ms / 1000)
+                raise TimeoutError('Wait for finished buffer timeout')
+            if delay > 0:
+                time.sleep(delay)
+        try:
+            index, img = self._queue.get(timeout=timeout_ms / 1000)
+        except queue.Empty:
+            raise TimeoutError('Wait for finished buffer timeout')
+        self.frame_id = index
+        self.delivered += 1
+        if out is None:
+            return img
+        np.copyto(out, img)
+        return out
+
+    def get_frame_nocopy(self, timeout_ms=1000):
+        return self.get_frame(timeout_ms)
+
+    def get_frames(self, n, out=None, timeout_ms=1000):
+        """Gets up to n frames in a (n, height, width) block, as ids_library.Camera.get_frames"""
+        self._grab_thread = threading.get_ident()
+        self._apply_changes() # before sizing the block
+        if out is None:
+            out = np.empty((n, self.get_height(), self.get_width()), dtype=self.stack.dtype)
+        n = min(n, len(out))
+        frame_ids = np.empty(n, dtype=np.int64)
+        timestamps = np.empty(n, dtype=np.int64)
+        count = 0
+        while count < n:
+            try:
+                self._next_frame(timeout_ms, out[count])
+            except TimeoutError:
+                if count == 0:
+                    raise
+                break
+            frame_ids[count] = self.frame_id
+            timestamps[count] = time.perf_counter_ns()
+            count += 1
+        return out[:count], frame_ids[:count], timestamps[:count]
+
+    def close(self):
+        self.stop_acquisition()
+        if hasattr(self.stack, 'file'):
+            self.stack.file.close()
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Chunked Zarr writer for IDS frame stacks.
+Frames are gathered in blocks of chunk_frames and each block is compressed
+and written by a thread pool, so that compression runs in parallel with the acquisition.
+While a writer is open, the internal threads of Blosc (numcodecs.blosc.use_threads,
+a process-wide setting) are disabled; close restores the previous setting.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import numpy as np
+
+CompressorChoices = ['blosc-lz4', 'blosc-zstd', 'none']
+
+
+def open_zarr_array(path, shape, chunks, dtype, compressor='blosc-lz4', clevel=5):
+    """
+    Creates a Zarr array in a local directory store, overwriting any existing one.
+    Supports both zarr 2 and zarr 3.
+    """
+    import zarr # imported here, zarr is only needed when saving to Zarr
+    if compressor not in CompressorChoices:
+        raise ValueError(f"Unknown compressor: {compressor}")
+    cname = compressor.split('-')[-1]
+
+    if int(zarr.__version__.split('.')[0]) >= 3:
+        from zarr.codecs import BloscCodec
+        compressors = None
+        if compressor != 'none':
+            compressors = [BloscCodec(cname=cname, clevel=clevel, shuffle='bitshuffle')]
+        return zarr.create_array(store=path, shape=shape, chunks=chunks, dtype=dtype,
+                                 compressors=compressors, overwrite=True)
+
+    from numcodecs import Blosc
+    codec = None
+    if compressor != 'none':
+        codec = Blosc(cname=cname, clevel=clevel, shuffle=Blosc.BITSHUFFLE)
+    return zarr.open_array(path, mode='w', shape=shape, chunks=chunks,
+                           dtype=dtype, compressor=codec)
+
+
+class ZarrWriter:
+
+    def __init__(self, path, shape, dtype, chunk_frames=16, compressor='blosc-lz4',
+                 clevel=5, threads=4, element_size_um=None):
+        """
+        Args:
+            path (str): directory of the Zarr store
+            shape (tuple): (frames, height, width) of the stack
+            chunk_frames (int): number of frames per chunk. Each chunk spans the full frame
+            threads (int): number of threads compressing and writing chunks concurrently
+            element_size_um (list): voxel size in z,y,x, stored as attribute
+        """
+        self.shape = tuple(shape)
+        self.chunk_frames = max(1, min(int(chunk_frames), self.shape[0]))
+        chunks = (self.chunk_frames, self.shape[1], self.shape[2])
+        self.array = open_zarr_array(path, self.shape, chunks, dtype, compressor, clevel)
+        from numcodecs import blosc
+        self._blosc_use_threads = blosc.use_threads
+        blosc.use_threads = False # parallelism is given by the writer threads
+        if element_size_um is not None:
+            self.array.attrs['element_size_um'] = [float(v) for v in element_size_um]
+
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+        # a fixed set of blocks is recycled: at most threads+1 blocks are in flight
+        self._free_blocks = [np.empty(chunks, dtype=dtype) for _ in range(threads + 1)]
+        self._free = threading.Semaphore(threads + 1)
+        self._lock = threading.Lock()
+        self._futures = []
+        self._block = None
+        self._block_start = 0
+        self._count = 0
+
+    def _get_block(self):
+        self._free.acquire()
+        with self._lock:
+            return self._free_blocks.pop()
+
+    def _write_block(self, block, start, stop):
+        try:
+            self.array[start:stop] = block[:stop-start]
+        finally:
+            with self._lock:
+                self._free_blocks.append(block)
+            self._free.release()
+
+    def _submit(self):
+        stop = self._block_start + self._count
+        self._futures.append(self.pool.submit(self._write_block, self._block, self._block_start, stop))
+        self._futures = [f for f in self._futures if not f.done() or f.exception()]
+        self._block = None
+        self._block_start = stop
+        self._count = 0
+
+    def write(self, img):
+        """ Appends a frame to the stack"""
+        if self._block is None:
+            self._block = self._get_block()
+        self._block[self._count] = img
+        self._count += 1
+        if self._count == self.chunk_frames:
+            self._submit()
+
+    def next_frames(self, n):
+        """ Returns a view of up to n free frames of the current chunk, to be filled in place
+        (e.g. by Camera.get_frames(out=...)) and then committed with commit"""
+        if self._block is None:
+            self._block = self._get_block()
+        stop = min(self._count + n, self.chunk_frames, self.shape[0] - self._block_start)
+        return self._block[self._count:stop]
+
+    def commit(self, n):
+        """ Appends the n frames filled in the view returned by next_frames"""
+        self._count += n
+        if self._count == self.chunk_frames:
+            self._submit()
+
+    @property
+    def frames_written(self):
+        return self._block_start + self._count
+
+    def close(self):
+        """ Writes the remaining frames and waits until all the chunks are stored"""
+        if self._block is not None and self._count > 0:
+            self._submit()
+        self.pool.shutdown(wait=True)
+        from numcodecs import blosc
+        blosc.use_threads = self._blosc_use_threads
+        for future in self._futures:
+            future.result() # raises the errors of the writer threads
+        self._futures = []